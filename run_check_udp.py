@@ -0,0 +1,98 @@
+import heapq
+import random
+import socket
+import sys
+import threading
+import time
+
+from server import wireFormat
+from server.playerHandler import PlayerHandler
+from server.udpChannel import UdpChannel
+
+# 模擬的網路狀況
+LOSS = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2    # 丟包率
+MAX_DELAY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.03  # 每個封包隨機延遲 0 ~ MAX_DELAY 秒 (造成亂序)
+N_PACKETS = 500
+
+random.seed(7)
+
+class LossyRelay:
+    """client -> relay -> server 的 UDP 轉送，隨機丟包並以隨機延遲打亂順序。"""
+
+    def __init__(self, target):
+        self.target = target
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.socket.settimeout(0.005)
+        self.address = self.socket.getsockname()
+        self.dropped = 0
+        self.forwarded = 0
+        self._queue = []
+        self._counter = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        while self._running or self._queue:
+            try:
+                data, _ = self.socket.recvfrom(2048)
+                if random.random() < LOSS:
+                    self.dropped += 1
+                else:
+                    self._counter += 1
+                    heapq.heappush(self._queue, (time.perf_counter() + random.uniform(0, MAX_DELAY), self._counter, data))
+            except socket.timeout:
+                pass
+            now = time.perf_counter()
+            while self._queue and self._queue[0][0] <= now:
+                _, _, data = heapq.heappop(self._queue)
+                out.sendto(data, self.target)
+                self.forwarded += 1
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+
+
+handler = PlayerHandler()
+pid = handler.register()
+channel = UdpChannel(handler, "127.0.0.1", 0)
+
+# 記錄 server 實際套用的 seq
+applied = []
+original_handle = channel.handle
+def handle(data):
+    ok = original_handle(data)
+    if ok:
+        applied.append(wireFormat.decode_position(data)["seq"])
+    return ok
+channel.handle = handle
+threading.Thread(target=channel.serve_forever, daemon=True).start()
+
+relay = LossyRelay(channel.address)
+client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+for seq in range(1, N_PACKETS + 1):
+    client.sendto(wireFormat.encode_position(pid, seq, "map.tmx", seq * 2.0, 64.0, "right", True), relay.address)
+    time.sleep(0.001)
+# 停下來的位置送兩份 (與 OnlineManager 相同)
+stop = wireFormat.encode_position(pid, N_PACKETS + 1, "map.tmx", (N_PACKETS + 1) * 2.0, 64.0, "right", False)
+client.sendto(stop, relay.address)
+client.sendto(stop, relay.address)
+time.sleep(0.05)
+relay.close()
+time.sleep(0.1)
+
+final = handler.list_players("map.tmx")[0]
+print(f"sent {N_PACKETS + 2}, dropped {relay.dropped}, delivered {relay.forwarded}")
+print(f"applied {channel.accepted}, stale (late / duplicate) {channel.stale}, invalid {channel.invalid}")
+assert all(a < b for a, b in zip(applied, applied[1:])), "applied out of order"
+assert final["x"] == applied[-1] * 2.0, "final state is not the newest applied packet"
+print(f"final x {final['x']} (seq {applied[-1]}), moving {final['moving']}")
+
+# 序號繞回 0 之後仍然視為比較新
+assert wireFormat.is_newer(1, 0xFFFFFFFF) and not wireFormat.is_newer(0xFFFFFFFF, 1)
+assert not wireFormat.is_newer(5, 5)
+channel.close()
+print("done")
@@ -0,0 +1,52 @@
+import json
+import time
+
+from server import wireFormat
+from server.playerHandler import PlayerHandler
+
+N_PLAYERS = 50
+ROUNDS = 2000
+
+handler = PlayerHandler()
+for i in range(N_PLAYERS):
+    pid = handler.register()
+    handler.update(pid, 64.0 * i + 12.5, 1234.25, "map.tmx", "left", i % 2 == 0)
+roster = handler.roster(None, "map.tmx")
+epoch = handler.map_ids.epoch
+map_id = handler.map_ids.intern("map.tmx")
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+# --- 請求 (一位玩家的狀態) ---
+request = {"id": 3, "x": 812.5, "y": 1234.25, "map": "map.tmx", "direction": "left", "moving": True,
+           "since": 120, "chat_after": 7}
+json_req = json.dumps(request).encode("utf-8")
+bin_req = wireFormat.encode_request(3, epoch, map_id, "map.tmx", 120, 7, 812.5, 1234.25, "left", True)
+assert wireFormat.decode_request(bin_req, handler.map_ids) == request
+print(f"request bytes:  json {len(json_req):5d}  binary {len(bin_req):5d}")
+
+# --- 回應 (同一張地圖上的 N_PLAYERS 位玩家) ---
+json_res = json.dumps(roster).encode("utf-8")
+bin_res = wireFormat.with_chat(wireFormat.encode_roster(roster, epoch, map_id), 0, [])
+decoded = wireFormat.decode_response(bin_res, "map.tmx")
+for a, b in zip(roster["players"], decoded["players"]):
+    assert (a["id"], a["x"], a["y"], a["direction"], a["moving"]) == (b["id"], b["x"], b["y"], b["direction"], b["moving"])
+    assert abs(a["last_seen"] - b["last_seen"]) < 0.002
+print(f"roster bytes:   json {len(json_res):5d}  binary {len(bin_res):5d}  ({N_PLAYERS} players)")
+
+print(f"encode roster:  json {timed(lambda: json.dumps(roster).encode('utf-8')):7.1f} us"
+      f"  binary {timed(lambda: wireFormat.encode_roster(roster, epoch, map_id)):7.1f} us")
+print(f"decode roster:  json {timed(lambda: json.loads(json_res)):7.1f} us"
+      f"  binary {timed(lambda: wireFormat.decode_response(bin_res, 'map.tmx')):7.1f} us")
+
+# server 重啟後舊的地圖 id 不能再用
+try:
+    wireFormat.decode_request(bin_req, PlayerHandler().map_ids)
+    print("stale map id: NOT detected")
+except wireFormat.StaleMapId:
+    print("stale map id: detected")
+print("done")
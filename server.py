@@ -1,65 +1,161 @@
 from server.playerHandler import PlayerHandler
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from server import wireFormat
+from server.udpChannel import UdpChannel
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from collections import OrderedDict
+import gzip
 import json
+import sys
+import threading
 
 PORT = 8989
-PLAYER_HANDLER = PlayerHandler()
+# 位置更新的 UDP port (client 開啟 ONLINE_UDP 時使用)
+UDP_PORT = 8989
+# 每秒 tick 次數：玩家更新每個 tick 套用一次，名單回應每個 tick 編碼一次
+TICK_RATE = 20
+# long-poll 最多等待的秒數
+MAX_POLL_TIMEOUT = 30.0
+# 回應超過這個大小且 client 接受 gzip 時才壓縮
+GZIP_MIN_BYTES = 1024
+# 超過這麼多秒沒有更新的玩家會被移除 (client 的 heartbeat 間隔要比這短)
+PLAYER_TIMEOUT = PlayerHandler.DEFAULT_TIMEOUT
+PLAYER_HANDLER = PlayerHandler(timeout=PLAYER_TIMEOUT)
 PLAYER_HANDLER.register() # Server dummy player (optional)
 
+# 同一個 tick 內所有 client 拿到的是同一份名單 bytes，壓縮結果也可以共用
+_GZIP_CACHE = OrderedDict()
+_GZIP_CACHE_SIZE = 64
+_GZIP_LOCK = threading.Lock()
+
+def _gzip(data):
+    with _GZIP_LOCK:
+        compressed = _GZIP_CACHE.get(data)
+        if compressed is not None:
+            _GZIP_CACHE.move_to_end(data)
+            return compressed
+    compressed = gzip.compress(data, compresslevel=5)
+    with _GZIP_LOCK:
+        _GZIP_CACHE[data] = compressed
+        if len(_GZIP_CACHE) > _GZIP_CACHE_SIZE:
+            _GZIP_CACHE.popitem(last=False)
+    return compressed
+
 class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1：client 可以在同一條連線上連續送請求 (每個回應都有 Content-Length)
+    protocol_version = "HTTP/1.1"
+    # 標頭與內容分兩次寫出，關掉 Nagle 避免小回應被延遲
+    disable_nagle_algorithm = True
+
     def do_GET(self):
-        if self.path == "/":
+        url = urlsplit(self.path)
+        path = url.path
+        query = parse_qs(url.query)
+
+        if path == "/":
             self._json(200, {"status": "ok"})
             return
             
-        if self.path == "/register":
+        if path == "/register":
             pid = PLAYER_HANDLER.register()
             self._json(200, {"message": "registration successful", "id": pid})
             return
 
-        if self.path == "/players":
-            self._json(200, {"players": PLAYER_HANDLER.list_players()})
+        if path == "/players":
+            # ?since=<version>：只回傳之後有變動的玩家與被移除的 id
+            # ?map=<name>：只回傳那張地圖上的玩家
+            try:
+                since = int(query["since"][0]) if "since" in query else None
+            except ValueError:
+                self._json(400, {"error": "bad_since"})
+                return
+            map_name = query["map"][0] if "map" in query else None
+            # 先取版本再編碼：回應的內容至少和 ETag 一樣新
+            # (完整列表與差異是不同的內容，since 也要放進 ETag)
+            etag = f'W/"{PLAYER_HANDLER.roster_version(map_name)}.{"full" if since is None else since}"'
+            if self._not_modified(etag):
+                return
+            self._send(200, PLAYER_HANDLER.encoded_roster(since, map_name), etag=etag)
             return
         
         # ★★★ 新增：獲取聊天訊息 ★★★
-        if self.path == "/chat":
-            self._json(200, {"messages": PLAYER_HANDLER.get_messages()})
+        if path == "/chat":
+            # ?after=<seq>：只回傳之後的新訊息
+            try:
+                after = int(query["after"][0]) if "after" in query else None
+            except ValueError:
+                self._json(400, {"error": "bad_after"})
+                return
+            last_seq, messages = PLAYER_HANDLER.get_messages(after)
+            etag = f'"{last_seq}"'
+            if self._not_modified(etag):
+                return
+            self._send(200, json.dumps({"messages": messages, "last_seq": last_seq}).encode("utf-8"), etag=etag)
+            return
+
+        # --- long-poll：等到名單或聊天在游標之後有新資料 (或逾時) 才回應，內容與 /sync 相同 ---
+        if path == "/poll":
+            # ?id=<pid>&map=<name>&since=<version>&after=<seq>&timeout=<秒>
+            try:
+                pid = int(query["id"][0]) if "id" in query else None
+                since = int(query["since"][0]) if "since" in query else None
+                after = int(query["after"][0]) if "after" in query else None
+                timeout = min(max(float(query["timeout"][0]), 0.0), MAX_POLL_TIMEOUT) if "timeout" in query else MAX_POLL_TIMEOUT
+            except ValueError:
+                self._json(400, {"error": "bad_fields"})
+                return
+            map_name = query["map"][0] if "map" in query else ""
+            PLAYER_HANDLER.wait_for_change(map_name, since, after, timeout, pid)
+            # 逾時且名單、聊天都和 client 上次拿到的 (If-None-Match) 一樣時只回 304
+            etag = self._poll_etag(map_name, since, after)
+            if since is not None and after is not None and self._not_modified(etag):
+                return
+            self._send_roster_and_chat(since, after, map_name, etag)
             return
 
         self._json(404, {"error": "not_found"})
 
     def do_POST(self):
         length = int(self.headers.get("Content-Length", "0"))
+        # /sync 可以改用二進位格式 (server/wireFormat.py)
+        binary = self.headers.get("Content-Type") == wireFormat.CONTENT_TYPE
         try:
             body = self.rfile.read(length)
-            data = json.loads(body.decode("utf-8"))
+            if binary:
+                data = wireFormat.decode_request(body, PLAYER_HANDLER.map_ids)
+            else:
+                data = json.loads(body.decode("utf-8"))
+                # 合法的 JSON 但不是物件 (例如 [1, 2] 或 "x") 也當成格式錯誤
+                if not isinstance(data, dict):
+                    raise ValueError("body is not a JSON object")
+        except wireFormat.StaleMapId:
+            self._json(409, {"error": "stale_map_id"})
+            return
         except Exception:
-            self._json(400, {"error": "invalid_json"})
+            self._json(400, {"error": "invalid_body" if binary else "invalid_json"})
             return
 
         # --- 處理玩家更新 ---
         if self.path == "/players":
-            if "id" not in data:
-                self._json(400, {"error": "missing_id"})
-                return
+            if self._update_player(data) is not None:
+                self._json(200, {"success": True})
+            return
 
+        # --- 一次往返：上傳自己的狀態，取回其他玩家與聊天訊息 ---
+        if self.path == "/sync":
+            # 沒有帶座標時只取回資料 (client 沒有變動時的輪詢)，不更新自己的狀態
+            if "x" in data and self._update_player(data) is None:
+                return
             try:
-                pid = int(data["id"])
-                x = float(data.get("x", 0))
-                y = float(data.get("y", 0))
-                map_name = str(data.get("map", ""))
-                # ★★★ 新增：解析方向與移動狀態 ★★★
-                direction = str(data.get("direction", "down"))
-                moving = bool(data.get("moving", False))
-                
-                ok = PLAYER_HANDLER.update(pid, x, y, map_name, direction, moving)
-                if not ok:
-                    self._json(404, {"error": "player_not_found"})
-                    return
-                self._json(200, {"success": True})
-            except Exception as e:
-                print(e)
+                since = int(data["since"]) if data.get("since") is not None else None
+                after = int(data["chat_after"]) if data.get("chat_after") is not None else None
+            except (TypeError, ValueError):
                 self._json(400, {"error": "bad_fields"})
+                return
+            # 只回傳同一張地圖上的玩家 (名單是這個 tick 共用的 bytes，包含自己，由 client 過濾)
+            # POST 不做 If-None-Match (RFC 9110 規定條件不成立時要回 412 而不是 304)，沒有新資料的等待交給 GET /poll
+            map_name = str(data.get("map", ""))
+            self._send_roster_and_chat(since, after, map_name)
             return
 
         # --- ★★★ 新增：處理發送聊天訊息 ★★★ ---
@@ -67,20 +163,102 @@ class Handler(BaseHTTPRequestHandler):
             if "id" not in data or "msg" not in data:
                 self._json(400, {"error": "missing_fields"})
                 return
-            PLAYER_HANDLER.add_message(data["id"], data["msg"])
-            self._json(200, {"success": True})
+            seq = PLAYER_HANDLER.add_message(data["id"], data["msg"])
+            self._json(200, {"success": True, "seq": seq})
             return
 
         self._json(404, {"error": "not_found"})
 
+    def _update_player(self, data):
+        """依請求內容更新玩家狀態，成功時回傳玩家 id；失敗時已回應錯誤並回傳 None。"""
+        if "id" not in data:
+            self._json(400, {"error": "missing_id"})
+            return None
+
+        try:
+            pid = int(data["id"])
+            x = float(data.get("x", 0))
+            y = float(data.get("y", 0))
+            map_name = str(data.get("map", ""))
+            # ★★★ 新增：解析方向與移動狀態 ★★★
+            direction = str(data.get("direction", "down"))
+            moving = bool(data.get("moving", False))
+        except Exception as e:
+            print(e)
+            self._json(400, {"error": "bad_fields"})
+            return None
+
+        if not PLAYER_HANDLER.update(pid, x, y, map_name, direction, moving):
+            self._json(404, {"error": "player_not_found"})
+            return None
+        return pid
+
+    def _send_roster_and_chat(self, since, after, map_name, etag=None):
+        """map_name 上 since 之後的名單變動與 after 之後的聊天訊息 (client 接受時用二進位格式)。"""
+        if wireFormat.CONTENT_TYPE in self.headers.get("Accept", ""):
+            try:
+                roster = PLAYER_HANDLER.encoded_roster(since, map_name, binary=True)
+            except wireFormat.TooManyMaps:
+                # 地圖 id 用完了，client 可以改用 JSON 格式
+                self._json(400, {"error": "too_many_maps"})
+                return
+            last_seq, messages = PLAYER_HANDLER.get_messages(after)
+            self._send(200, wireFormat.with_chat(roster, last_seq, messages), wireFormat.CONTENT_TYPE, etag)
+            return
+        roster = PLAYER_HANDLER.encoded_roster(since, map_name)
+        last_seq, messages = PLAYER_HANDLER.get_messages(after)
+        chat = json.dumps({"last_seq": last_seq, "messages": messages}).encode("utf-8")
+        # 兩個 JSON 物件合併成一個：去掉名單的 "}" 與聊天的 "{"
+        self._send(200, roster[:-1] + b", " + chat[1:], etag=etag)
+
     def _json(self, code, obj):
-        data = json.dumps(obj).encode("utf-8")
+        self._send(code, json.dumps(obj).encode("utf-8"))
+
+    def _send(self, code, data, content_type="application/json", etag=None):
+        """送出已經編碼好的 bytes (預設為 JSON)；夠大且 client 接受時以 gzip 壓縮。"""
         self.send_response(code)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        if len(data) >= GZIP_MIN_BYTES:
+            self.send_header("Vary", "Accept-Encoding")
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                data = _gzip(data)
+                self.send_header("Content-Encoding", "gzip")
         self.send_header("Content-Length", str(len(data)))
         self.end_headers()
         self.wfile.write(data)
 
+    def _poll_etag(self, map_name, since, after):
+        """/poll 回應的 ETag：請求的游標、名單與聊天的版本都相同時內容也相同。"""
+        # epoch 區分 server 重啟前後；不在這裡 intern 地圖名稱 (JSON 格式用不到 id)
+        binary = wireFormat.CONTENT_TYPE in self.headers.get("Accept", "")
+        return (f'W/"{PLAYER_HANDLER.map_ids.epoch:x}.{"b" if binary else "j"}.'
+                f'{since}.{PLAYER_HANDLER.roster_version(map_name)}.{after}.{PLAYER_HANDLER.last_seq}"')
+
+    def _not_modified(self, etag):
+        """If-None-Match 符合 etag 時回應 304 (沒有內容) 並回傳 True。"""
+        tags = [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]
+        # 弱比較：忽略 W/ 前綴
+        if etag.removeprefix("W/") not in [t.removeprefix("W/") for t in tags] and "*" not in tags:
+            return False
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.end_headers()
+        return True
+
+class Server(ThreadingHTTPServer):
+    # 每個連線一個執行緒，慢的 client 不會擋住其他人；PlayerHandler 本身是 thread-safe 的
+    daemon_threads = True
+    # 預設 backlog 只有 5，大量 client 同時連線時會被拒絕
+    request_queue_size = 128
+
 if __name__ == "__main__":
-    print(f"[Server] Running on localhost with port {PORT}")
-    HTTPServer(("0.0.0.0", PORT), Handler).serve_forever()
\ No newline at end of file
+    tick_rate = int(sys.argv[1]) if len(sys.argv) > 1 else TICK_RATE
+    if len(sys.argv) > 2:
+        PLAYER_HANDLER.set_timeout(float(sys.argv[2]))
+    threading.Thread(target=PLAYER_HANDLER.run, args=(tick_rate,), daemon=True).start()
+    threading.Thread(target=PLAYER_HANDLER.run_reaper, daemon=True).start()
+    threading.Thread(target=UdpChannel(PLAYER_HANDLER, "0.0.0.0", UDP_PORT).serve_forever, daemon=True).start()
+    print(f"[Server] Running on localhost with port {PORT} ({tick_rate} ticks/s, UDP {UDP_PORT}, timeout {PLAYER_HANDLER.timeout:g}s)")
+    Server(("0.0.0.0", PORT), Handler).serve_forever()
\ No newline at end of file
@@ -1,52 +1,456 @@
+import heapq
+import json
+import threading
 import time
+from bisect import bisect_right
+from collections import OrderedDict, deque, namedtuple
+
+from server import wireFormat
+
+# 玩家列表的唯讀快照
+# - version: 產生快照時的最新版本號
+# - players / versions: 依版本號排序的玩家與對應版本 (用來二分搜尋 since 之後的變動)
+# - removed: 保留中的移除紀錄 (version, pid)；版本 <= removed_floor 的紀錄已經丟掉
+# - maps: 有玩家的地圖各自的 _View (只含在那張地圖上的玩家，removed 為離開該地圖的紀錄)
+# - vacated_floor: 沒有玩家的地圖 (已丟掉離開紀錄) 的 removed_floor
+_Snapshot = namedtuple("_Snapshot", "version players versions removed removed_floor maps vacated_floor")
+# 一群玩家 (全部或某張地圖) 依版本排序的唯讀資料
+_View = namedtuple("_View", "players versions removed removed_floor")
+# 每個 tick 預先編碼好的名單回應 (所有請求共用同一份 bytes)
+# - version / prev_version: 這個 tick 與上一個 tick 的版本號
+# - rosters: {地圖名稱 (None 為全部): (完整列表, 自上個 tick 的差異, 沒有變動)}
+# - binary: {(地圖名稱, since): 二進位格式}，第一次有 client 要時才編碼
+_Encoded = namedtuple("_Encoded", "version prev_version rosters binary")
 
 class PlayerHandler:
-    def __init__(self):
-        self._players = {} 
+    """
+    線上玩家與聊天資料。
+
+    server 會以多執行緒同時處理請求，所以：
+    - 所有修改都在 self._lock 內進行
+    - 已發佈的資料 (玩家 dict、快照) 不再原地修改，更新時換成新的物件 (copy-on-write)
+    - 讀取直接拿目前的快照，不需要等鎖
+
+    每次玩家新增、更新或移除都會取得一個遞增的版本號，
+    client 帶上次拿到的版本 (since) 就只會收到之後有變動的玩家與被移除的 id。
+
+    玩家另外依所在地圖建索引，client 只需要自己地圖上的玩家 (interest management)；
+    玩家換地圖或被移除時，會在原本的地圖留下離開紀錄，該地圖的 client 才會把他移除。
+
+    以 run() 固定頻率 tick 時，玩家更新先累積起來，每個 tick 套用一次，
+    並把每張地圖的名單回應編碼一次，這個 tick 內的請求都直接使用同一份 bytes。
+
+    wait_for_change() 讓 long-poll 請求等到名單或聊天有新資料 (或逾時) 才回應。
+
+    超過 timeout 秒沒有更新的玩家由 run_reaper() 背景移除：每位玩家在 min-heap 裡有一個到期時間，
+    到期時才檢查 (期間有更新就以新的到期時間放回去)，讀取不需要掃描所有玩家。
+    移除和其他變動一樣取得版本號，名單差異的 removed 會帶到 client，
+    另外也會通知 add_removal_listener() 註冊的 callback。
+    """
+    # 保留的移除紀錄數量，比這更舊的 since 會要求 client 完整重新同步
+    MAX_REMOVED_LOG = 1024
+    # 聊天訊息 ring buffer 的容量
+    MAX_MESSAGES = 50
+    # ★★★ 修改點：將 5 改為 600 (10分鐘)，避免戰鬥中被踢除 ★★★
+    DEFAULT_TIMEOUT = 600
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # 依最後更新的版本排序 (更新時移到最後)
+        self._players = OrderedDict()
         self._next_id = 0
-        self._messages = [] 
+        self._version = 0
+        self._removed = deque()
+        self._removed_floor = 0
+        # 各地圖的離開紀錄 (version, pid) 與已丟棄紀錄的最大版本；地圖沒有玩家時整個丟掉，
+        # 只留下所有被丟掉紀錄的最大版本 (client 傳來的任意地圖名稱不會一直留在快照與 tick 裡)
+        self._departed = {}
+        self._departed_floor = {}
+        self._vacated_floor = 0
+        # 聊天訊息：第 seq 則放在 seq % MAX_MESSAGES，新的直接覆蓋最舊的
+        self._messages = [None] * self.MAX_MESSAGES
+        self._last_seq = 0
+        # 玩家資料改變時設為 None，下次讀取時重建
+        self._snapshot = None
+        # tick 模式：兩個 tick 之間的玩家更新 (每位玩家只留最新一筆) 與預先編碼的回應
+        self._ticking = False
+        self._pending = {}
+        self._encoded = None
+        # 二進位格式用的地圖 id
+        self.map_ids = wireFormat.MapIds()
+        # 逾時檢查：每位玩家一筆 (到期時間, pid)；到期時玩家若有更新過就以新的時間放回去
+        self._expiry = []
+        self._reaper_wakeup = threading.Event()
+        self._removal_listeners = []
+        # 資料有變動時遞增並喚醒 wait_for_change()；與 self._lock 分開，等待的一方檢查條件時不會互鎖
+        self._changed = threading.Condition()
+        self._changes = 0
 
     def register(self):
-        pid = self._next_id
-        self._next_id += 1
-        self._players[pid] = {
-            "id": pid, 
-            "x": 0, 
-            "y": 0, 
-            "map": "world",
-            "direction": "down",
-            "moving": False,
-            "last_seen": time.time()
-        }
+        with self._lock:
+            pid = self._next_id
+            self._next_id += 1
+            self._version += 1
+            self._players[pid] = {
+                "id": pid,
+                "x": 0,
+                "y": 0,
+                "map": "world",
+                "direction": "down",
+                "moving": False,
+                "version": self._version,
+                "last_seen": time.time()
+            }
+            self._snapshot = None
+            heapq.heappush(self._expiry, (self._players[pid]["last_seen"] + self.timeout, pid))
+        self._notify_change()
         return pid
 
     def update(self, pid, x, y, map_name, direction="down", moving=False):
-        if pid not in self._players:
-            return False
-        self._players[pid]["x"] = x
-        self._players[pid]["y"] = y
-        self._players[pid]["map"] = map_name
-        self._players[pid]["direction"] = direction
-        self._players[pid]["moving"] = moving
-        self._players[pid]["last_seen"] = time.time()
+        with self._lock:
+            if pid not in self._players:
+                return False
+            if self._ticking:
+                # 等下一個 tick 再套用
+                self._pending[pid] = (x, y, map_name, direction, moving, time.time())
+                return True
+            self._apply_update(pid, x, y, map_name, direction, moving, time.time())
+        self._notify_change()
         return True
 
-    def list_players(self):
-        # ★★★ 修改點：將 5 改為 600 (10分鐘)，避免戰鬥中被踢除 ★★★
-        now = time.time()
-        to_remove = [pid for pid, p in self._players.items() if now - p["last_seen"] > 600]
-        for pid in to_remove:
-            del self._players[pid]
-        return list(self._players.values())
+    def _apply_update(self, pid, x, y, map_name, direction, moving, seen):
+        # 呼叫端需持有 self._lock
+        self._version += 1
+        old_map = self._players[pid]["map"]
+        if old_map != map_name:
+            self._log_departure(old_map, pid)
+        # 換成新的 dict，正在被序列化的舊快照不受影響
+        self._players[pid] = {
+            "id": pid,
+            "x": x,
+            "y": y,
+            "map": map_name,
+            "direction": direction,
+            "moving": moving,
+            "version": self._version,
+            "last_seen": seen
+        }
+        self._players.move_to_end(pid)
+        self._snapshot = None
+
+    # ------------------------------------------------------
+    # Tick
+    # ------------------------------------------------------
+    def run(self, tick_rate):
+        """以 tick_rate (Hz) 固定頻率 tick，直到程式結束 (在背景執行緒呼叫)。"""
+        self._ticking = True
+        interval = 1.0 / tick_rate
+        next_tick = time.perf_counter()
+        while True:
+            self.tick()
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # 跟不上就從現在重新計時，不要連續補 tick
+                next_tick = time.perf_counter()
+
+    def tick(self):
+        """套用累積的玩家更新，並為每張地圖編碼一次名單回應。"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for pid, update in pending.items():
+                if pid in self._players:
+                    self._apply_update(pid, *update)
+        snapshot = self._get_snapshot()
+
+        encoded = self._encoded
+        if encoded is not None and encoded.version == snapshot.version:
+            return  # 沒有任何變動，沿用上一份
+        prev_version = encoded.version if encoded is not None else None
+        rosters = {}
+        for map_name in [None, *snapshot.maps]:
+            empty = json.dumps(self._roster_since(snapshot, snapshot.version, map_name)).encode("utf-8")
+            full = json.dumps(self._roster_since(snapshot, None, map_name)).encode("utf-8")
+            delta = None
+            if prev_version is not None:
+                delta = json.dumps(self._roster_since(snapshot, prev_version, map_name)).encode("utf-8")
+            rosters[map_name] = (full, delta, empty)
+        self._encoded = _Encoded(snapshot.version, prev_version, rosters, {})
+        self._notify_change()
+
+    def encoded_roster(self, since=None, map_name=None, binary=False):
+        """
+        roster() 的 JSON bytes (binary 為 True 時是 wireFormat.encode_roster 的格式)。
+        請求的是最近一個 tick 的完整列表、差異或「沒有變動」時，
+        直接回傳 tick 預先編碼好的 bytes；其他情況 (例如 client 漏掉好幾個 tick) 才現場編碼。
+        """
+        encoded = self._encoded
+        snapshot = self._get_snapshot()
+        if encoded is not None and encoded.version == snapshot.version and map_name in encoded.rosters:
+            full, delta, empty = encoded.rosters[map_name]
+            if since is None or since == encoded.version or (since == encoded.prev_version and delta is not None):
+                if not binary:
+                    return full if since is None else empty if since == encoded.version else delta
+                # 同一個 tick 內重複編碼也只是得到相同的 bytes，不需要加鎖
+                data = encoded.binary.get((map_name, since))
+                if data is None:
+                    data = self._encode(snapshot, since, map_name, True)
+                    encoded.binary[(map_name, since)] = data
+                return data
+        return self._encode(snapshot, since, map_name, binary)
+
+    def _encode(self, snapshot, since, map_name, binary):
+        roster = self._roster_since(snapshot, since, map_name)
+        if binary:
+            return wireFormat.encode_roster(roster, self.map_ids.epoch, self.map_ids.intern(map_name or ""))
+        return json.dumps(roster).encode("utf-8")
+
+    def roster(self, since=None, map_name=None):
+        """
+        玩家列表回應 (map_name 不是 None 時只含那張地圖)。since 為 None 時是完整列表
+        {"players", "version"}；否則是差異 {"players", "removed", "full", "version"}：
+        players 只含 since 之後變動的玩家，removed 為被移除 (或離開這張地圖) 的 id，
+        full 為 True 表示 since 太舊 (或 server 重啟過)，client 應整個替換。
+        """
+        return self._roster_since(self._get_snapshot(), since, map_name)
+
+    def _roster_since(self, snapshot, since, map_name):
+        version, players, removed, full = self._since(snapshot, since, map_name)
+        if since is None:
+            return {"players": players, "version": version}
+        return {"players": players, "removed": removed, "full": full, "version": version}
+
+    def roster_version(self, map_name=None):
+        """map_name (None 為全部) 的名單最後一次有變動的版本，沒有變動時名單回應的內容也不會變 (ETag 用)。"""
+        snapshot = self._get_snapshot()
+        if map_name is None:
+            return snapshot.version
+        view = self._map_view(snapshot, map_name)
+        # 沒有玩家的地圖丟掉離開紀錄時，floor 之前的 since 會拿到完整列表，也算是名單有變動
+        return max(view.versions[-1] if view.versions else 0, view.removed[-1][0] if view.removed else 0, view.removed_floor)
+
+    def list_players(self, map_name=None):
+        snapshot = self._get_snapshot()
+        if map_name is None:
+            return list(snapshot.players)
+        return list(self._map_view(snapshot, map_name).players)
+
+    def list_players_since(self, since=None, map_name=None):
+        """
+        回傳 (version, players, removed, full)。map_name 不是 None 時只看那張地圖上的玩家。
+        since 為 None、比保留的移除紀錄還舊、或比目前版本新 (server 重啟過) 時，
+        full 為 True，players 是完整列表；否則只有 since 之後變動的玩家與被移除的 id。
+        """
+        return self._since(self._get_snapshot(), since, map_name)
+
+    @staticmethod
+    def _map_view(snapshot, map_name):
+        view = snapshot.maps.get(map_name)
+        if view is None:
+            # 沒有玩家：since 比丟掉的離開紀錄舊時要完整重新同步 (結果是空的列表)
+            return _View((), [], (), snapshot.vacated_floor)
+        return view
+
+    def _since(self, snapshot, since, map_name):
+        if map_name is None:
+            view = _View(snapshot.players, snapshot.versions, snapshot.removed, snapshot.removed_floor)
+        else:
+            view = self._map_view(snapshot, map_name)
+        if since is None or since < view.removed_floor or since > snapshot.version:
+            return snapshot.version, list(view.players), [], True
+
+        changed = view.players[bisect_right(view.versions, since):]
+        removed = view.removed[bisect_right(view.removed, since, key=lambda r: r[0]):]
+        return snapshot.version, list(changed), [pid for _, pid in removed], False
+
+    # ------------------------------------------------------
+    # Long-poll
+    # ------------------------------------------------------
+    def wait_for_change(self, map_name, since, after, timeout, pid=None):
+        """
+        等到 map_name 的名單在 since 之後有其他玩家的變動、有 after 之後的聊天訊息，
+        或玩家 pid 在等待開始後離開了 map_name (client 換地圖了)；逾時回傳 False。
+        pid 自己的位置更新不算變動 (client 本來就知道)，移動中的玩家才不會每次送出都把自己的 poll 放回來。
+        since / after 為 None 時 (client 還沒有資料) 立刻回傳 True。
+        """
+        deadline = time.monotonic() + timeout
+        # 只有等待開始時還在 map_name 上才檢查離開：client 剛換地圖時，
+        # server 端的位置可能還是舊地圖，這時不能馬上放行，否則會一直重新輪詢
+        player = self._players.get(pid) if pid is not None else None
+        watch = player is not None and player["map"] == map_name
+        while True:
+            with self._changed:
+                seen = self._changes
+            if self._has_change(map_name, since, after, pid, watch):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with self._changed:
+                # 檢查條件的期間如果已經有變動就直接再檢查一次
+                if self._changes == seen:
+                    self._changed.wait(remaining)
+
+    def _has_change(self, map_name, since, after, pid, watch):
+        if since is None or after is None:
+            return True
+        # 有新的聊天訊息，或 after 比目前還新 (server 重啟過；since 的情況由 _since 回傳 full)
+        if after != self._last_seq:
+            return True
+        _, changed, removed, full = self._since(self._get_snapshot(), since, map_name)
+        if full or any(p["id"] != pid for p in changed) or any(r != pid for r in removed):
+            return True
+        if not watch:
+            return False
+        player = self._players.get(pid)
+        return player is not None and player["map"] != map_name
+
+    def _notify_change(self):
+        with self._changed:
+            self._changes += 1
+            self._changed.notify_all()
+
+    def _log_departure(self, map_name, pid):
+        # 呼叫前 self._version 已經是這次變動的版本
+        log = self._departed.setdefault(map_name, deque())
+        log.append((self._version, pid))
+        while len(log) > self.MAX_REMOVED_LOG:
+            self._departed_floor[map_name] = log.popleft()[0]
+
+    # ------------------------------------------------------
+    # 逾時移除
+    # ------------------------------------------------------
+    def run_reaper(self):
+        """背景移除逾時的玩家，直到程式結束 (在背景執行緒呼叫)。"""
+        while True:
+            self.reap()
+            with self._lock:
+                next_deadline = self._expiry[0][0] if self._expiry else None
+            # 新玩家的到期時間一定比現有的晚，只有 timeout 被改小時需要提早醒來 (set_timeout)
+            delay = self.timeout if next_deadline is None else next_deadline - time.time()
+            self._reaper_wakeup.wait(max(0.0, min(delay, self.timeout)))
+            self._reaper_wakeup.clear()
+
+    def set_timeout(self, timeout):
+        with self._lock:
+            self.timeout = timeout
+            # 重新排程：到期時間改以新的 timeout 計算
+            self._expiry = [(p["last_seen"] + timeout, pid) for pid, p in self._players.items()]
+            heapq.heapify(self._expiry)
+        self._reaper_wakeup.set()
+
+    def add_removal_listener(self, callback):
+        """玩家因逾時被移除時以 callback(pid) 通知 (在 reaper 執行緒呼叫)。"""
+        self._removal_listeners.append(callback)
+
+    def reap(self, now=None):
+        """移除所有已逾時的玩家，回傳被移除的 id。"""
+        if now is None:
+            now = time.time()
+        removed = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, pid = heapq.heappop(self._expiry)
+                player = self._players.get(pid)
+                if player is None:
+                    continue
+                # 還在等 tick 套用的更新也算
+                pending = self._pending.get(pid)
+                deadline = (pending[-1] if pending else player["last_seen"]) + self.timeout
+                if deadline > now:
+                    # 期間有更新過，以新的到期時間放回去
+                    heapq.heappush(self._expiry, (deadline, pid))
+                    continue
+                del self._players[pid]
+                self._version += 1
+                self._removed.append((self._version, pid))
+                self._log_departure(player["map"], pid)
+                removed.append(pid)
+            if removed:
+                while len(self._removed) > self.MAX_REMOVED_LOG:
+                    self._removed_floor = self._removed.popleft()[0]
+                self._snapshot = None
+        if removed:
+            for callback in self._removal_listeners:
+                for pid in removed:
+                    callback(pid)
+            self._notify_change()
+        return removed
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                players = tuple(self._players.values())
+                # 依地圖分組 (players 已依版本排序，分組後也維持排序)
+                by_map = {}
+                for p in players:
+                    by_map.setdefault(p["map"], []).append(p)
+                # 已經沒有玩家的地圖丟掉離開紀錄 (之後用 vacated_floor 判斷要不要完整重新同步)
+                for name in [name for name in self._departed if name not in by_map]:
+                    log = self._departed.pop(name)
+                    floor = self._departed_floor.pop(name, 0)
+                    self._vacated_floor = max(self._vacated_floor, log[-1][0] if log else floor)
+                for name in by_map:
+                    # 重新有玩家的地圖：丟掉的紀錄之前的 since 仍要完整重新同步
+                    self._departed_floor.setdefault(name, self._vacated_floor)
+                maps = {
+                    name: _View(
+                        players=tuple(group),
+                        versions=[p["version"] for p in group],
+                        removed=tuple(self._departed.get(name, ())),
+                        removed_floor=self._departed_floor[name],
+                    )
+                    for name, group in by_map.items()
+                }
+                self._snapshot = _Snapshot(
+                    version=self._version,
+                    players=players,
+                    versions=[p["version"] for p in players],
+                    removed=tuple(self._removed),
+                    removed_floor=self._removed_floor,
+                    maps=maps,
+                    vacated_floor=self._vacated_floor,
+                )
+            return self._snapshot
 
     def add_message(self, pid, msg):
-        self._messages.append({
-            "id": pid,
-            "msg": msg,
-            "time": time.time()
-        })
-        if len(self._messages) > 50:
-            self._messages.pop(0)
-
-    def get_messages(self):
-        return self._messages
\ No newline at end of file
+        with self._lock:
+            seq = self._last_seq + 1
+            self._messages[seq % self.MAX_MESSAGES] = {
+                "seq": seq,
+                "id": pid,
+                "msg": msg,
+                "time": time.time()
+            }
+            # 先放好訊息再更新 last_seq，不加鎖的讀取看到新 seq 時訊息一定已經在 buffer 裡
+            self._last_seq = seq
+        self._notify_change()
+        return seq
+
+    @property
+    def last_seq(self):
+        """最新一則聊天訊息的 seq (還沒有訊息時為 0)。"""
+        return self._last_seq
+
+    def get_messages(self, after=None):
+        """
+        回傳 (last_seq, messages)：messages 是 seq 大於 after 且仍在 buffer 裡的訊息。
+        after 為 None 或比 last_seq 還大 (server 重啟過) 時回傳整個 buffer。
+        """
+        last = self._last_seq
+        if after is None or after > last:
+            after = 0
+        messages = []
+        for seq in range(max(after + 1, last - self.MAX_MESSAGES + 1, 1), last + 1):
+            message = self._messages[seq % self.MAX_MESSAGES]
+            # 讀取途中這格可能已被更新的訊息覆蓋，seq 不符就略過
+            if message is not None and message["seq"] == seq:
+                messages.append(message)
+        return last, messages
@@ -0,0 +1,69 @@
+import socket
+import threading
+
+from server import wireFormat
+
+class UdpChannel:
+    """
+    以 UDP 接收玩家位置 (格式見 wireFormat.encode_position)。
+
+    位置更新可以容忍遺失：每位玩家只記最後接受的 seq，
+    比它舊 (晚到或重複) 的 datagram 直接丟掉，新的交給 PlayerHandler.update。
+    註冊與聊天仍然走 HTTP。
+    """
+    # 單一 datagram 的上限 (header + 地圖名稱)
+    MAX_DATAGRAM = 512
+
+    def __init__(self, player_handler, host="0.0.0.0", port=8989):
+        self.player_handler = player_handler
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.address = self.socket.getsockname()
+        self._lock = threading.Lock()
+        self._last_seq = {}
+        player_handler.add_removal_listener(self._forget)
+        # 統計：接受 / 過時丟棄 / 格式錯誤
+        self.accepted = 0
+        self.stale = 0
+        self.invalid = 0
+
+    def serve_forever(self):
+        while True:
+            try:
+                data, _ = self.socket.recvfrom(self.MAX_DATAGRAM)
+            except OSError:
+                return  # socket 已關閉
+            self.handle(data)
+
+    def close(self):
+        self.socket.close()
+
+    def _forget(self, pid):
+        # 玩家逾時被移除，之後的 id 不會再用到
+        with self._lock:
+            self._last_seq.pop(pid, None)
+
+    def handle(self, data):
+        """處理一個 datagram，有套用到玩家狀態時回傳 True。"""
+        try:
+            pos = wireFormat.decode_position(data)
+        except Exception:
+            self.invalid += 1
+            return False
+
+        pid, seq = pos["id"], pos["seq"]
+        with self._lock:
+            last = self._last_seq.get(pid)
+            if last is not None and not wireFormat.is_newer(seq, last):
+                self.stale += 1
+                return False
+            self._last_seq[pid] = seq
+
+        if not self.player_handler.update(pid, pos["x"], pos["y"], pos["map"], pos["direction"], pos["moving"]):
+            # 玩家不存在 (還沒註冊或已經被移除)
+            with self._lock:
+                self._last_seq.pop(pid, None)
+            self.invalid += 1
+            return False
+        self.accepted += 1
+        return True
@@ -0,0 +1,232 @@
+"""
+/sync 的二進位格式 (client 以 Content-Type / Accept: application/x-mg-sync 協商，預設仍為 JSON)。
+
+所有數值為 little-endian：
+    請求:   SyncRequest | [地圖名稱 UTF-8]
+    回應:   SyncHeader | PlayerRecord * n_players | 移除的 id (uint32) * n_removed | 聊天訊息 JSON
+
+- 地圖名稱由 server 編成小整數 (MapIds)，回應帶回請求地圖的 id，之後的請求只送 id；
+  id 只在同一個 server epoch 內有效，server 重啟後 client 會收到 409 並改送名稱
+- 方向與移動狀態放在同一個 byte (bit 0-1 方向、bit 2 移動中；請求的 bit 3 表示有帶座標，沒有時只是輪詢)
+- 座標量化成 1/COORD_SCALE 像素的 uint16 (最大約 16383 像素)
+- last_seen 以「比回應產生時間早幾毫秒」存成 uint32
+
+UDP 位置 datagram (server/udpChannel.py)：PositionDatagram | 地圖名稱 UTF-8
+seq 為 client 每次送出遞增的 uint32，server 只接受比上一個收到的還新的 datagram。
+"""
+import json
+import random
+import struct
+import threading
+import time
+
+CONTENT_TYPE = "application/x-mg-sync"
+
+COORD_SCALE = 4
+_COORD_MAX = 0xFFFF
+# 請求中沒有地圖 id 時 (還不知道或 epoch 不同)，名稱接在請求後面
+NO_MAP_ID = 0xFFFF
+NO_VALUE = 0xFFFFFFFF
+
+DIRECTIONS = ("down", "left", "right", "up")
+_DIRECTION_BITS = {name: i for i, name in enumerate(DIRECTIONS)}
+_MOVING = 0x04
+_HAS_POSITION = 0x08
+_FULL = 0x01
+
+# pid, epoch, map_id, x, y, flags, since, chat_after (since / chat_after 為 NO_VALUE 表示沒有)
+SyncRequest = struct.Struct("<IIHHHBII")
+# epoch, map_id, flags, version, time, n_players, n_removed, last_seq
+SyncHeader = struct.Struct("<IHBIdHHI")
+# pid, x, y, flags, 距 time 的毫秒數
+PlayerRecord = struct.Struct("<IHHBI")
+# pid, seq, x, y, flags
+PositionDatagram = struct.Struct("<IIHHB")
+
+
+class StaleMapId(Exception):
+    """請求中的地圖 id 屬於別的 server epoch (server 重啟過)。"""
+
+
+class TooManyMaps(ValueError):
+    """地圖 id 已經用完 (收過 NO_MAP_ID 個不同的地圖名稱)。"""
+
+
+class MapIds:
+    """地圖名稱 <-> 小整數 id (server 端，程式執行期間不會回收)。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._names = []
+        # 每次啟動不同，client 用來判斷手上的 id 還能不能用
+        self.epoch = random.getrandbits(32)
+
+    def intern(self, name):
+        """name 的 id (第一次出現時配發)；id 用完時丟出 TooManyMaps。"""
+        map_id = self._ids.get(name)
+        if map_id is None:
+            with self._lock:
+                map_id = self._ids.get(name)
+                if map_id is None:
+                    map_id = len(self._names)
+                    if map_id >= NO_MAP_ID:
+                        raise TooManyMaps("too many map names")
+                    self._names.append(name)
+                    self._ids[name] = map_id
+        return map_id
+
+    def name(self, map_id):
+        return self._names[map_id]
+
+
+def _flags(direction, moving):
+    return _DIRECTION_BITS.get(direction, 0) | (_MOVING if moving else 0)
+
+
+def _coord(value):
+    return min(max(int(value * COORD_SCALE + 0.5), 0), _COORD_MAX)
+
+
+def _optional(value):
+    return NO_VALUE if value is None else value
+
+
+# ------------------------------------------------------
+# Client -> server
+# ------------------------------------------------------
+def encode_request(pid, epoch, map_id, map_name, since, chat_after, x=None, y=None, direction="down", moving=False):
+    """map_id 為 None 時改送地圖名稱；x 為 None 時只輪詢，不更新自己的狀態。"""
+    if x is None:
+        coords, flags = (0, 0), 0
+    else:
+        coords, flags = (_coord(x), _coord(y)), _flags(direction, moving) | _HAS_POSITION
+    head = SyncRequest.pack(
+        pid, epoch or 0, NO_MAP_ID if map_id is None else map_id,
+        *coords, flags, _optional(since), _optional(chat_after)
+    )
+    if map_id is None:
+        return head + map_name.encode("utf-8")
+    return head
+
+
+def decode_request(data, map_ids):
+    """回傳與 JSON /sync 請求相同欄位的 dict。地圖 id 已失效時丟出 StaleMapId。"""
+    pid, epoch, map_id, x, y, flags, since, chat_after = SyncRequest.unpack_from(data)
+    if map_id == NO_MAP_ID:
+        map_name = bytes(data[SyncRequest.size:]).decode("utf-8")
+    elif epoch != map_ids.epoch:
+        raise StaleMapId()
+    else:
+        map_name = map_ids.name(map_id)
+    request = {
+        "id": pid,
+        "map": map_name,
+        "since": None if since == NO_VALUE else since,
+        "chat_after": None if chat_after == NO_VALUE else chat_after,
+    }
+    if flags & _HAS_POSITION:
+        request.update(
+            x=x / COORD_SCALE,
+            y=y / COORD_SCALE,
+            direction=DIRECTIONS[flags & 0x03],
+            moving=bool(flags & _MOVING),
+        )
+    return request
+
+
+# ------------------------------------------------------
+# Server -> client
+# ------------------------------------------------------
+def encode_roster(roster, epoch, map_id, now=None):
+    """PlayerHandler.roster() 的結果編成 SyncHeader (last_seq 之後補上) 與玩家、移除紀錄。"""
+    if now is None:
+        now = time.time()
+    players = roster["players"]
+    removed = roster.get("removed", ())
+    parts = [SyncHeader.pack(
+        epoch, map_id, _FULL if roster.get("full", True) else 0,
+        roster["version"], now, len(players), len(removed), 0
+    )]
+    pack = PlayerRecord.pack
+    directions = _DIRECTION_BITS
+    for p in players:
+        x = int(p["x"] * COORD_SCALE + 0.5)
+        y = int(p["y"] * COORD_SCALE + 0.5)
+        parts.append(pack(
+            p["id"],
+            x if 0 <= x <= _COORD_MAX else _coord(p["x"]),
+            y if 0 <= y <= _COORD_MAX else _coord(p["y"]),
+            directions.get(p["direction"], 0) | (_MOVING if p["moving"] else 0),
+            max(0, int((now - p["last_seen"]) * 1000))
+        ))
+    if removed:
+        parts.append(struct.pack(f"<{len(removed)}I", *removed))
+    return b"".join(parts)
+
+
+def with_chat(roster, last_seq, messages):
+    """在 encode_roster 的結果填上 last_seq，並把聊天訊息 (JSON) 接在後面。"""
+    header = bytearray(roster[:SyncHeader.size])
+    struct.pack_into("<I", header, SyncHeader.size - 4, last_seq)
+    tail = json.dumps(messages).encode("utf-8") if messages else b""
+    return bytes(header) + roster[SyncHeader.size:] + tail
+
+
+def decode_response(data, map_name):
+    """回傳與 JSON /sync 回應相同欄位的 dict (玩家都在 map_name 上)，另外帶 epoch 與 map_id。"""
+    epoch, map_id, flags, version, now, n_players, n_removed, last_seq = SyncHeader.unpack_from(data)
+    offset = SyncHeader.size
+    players = []
+    for pid, x, y, pflags, age in PlayerRecord.iter_unpack(data[offset:offset + n_players * PlayerRecord.size]):
+        players.append({
+            "id": pid,
+            "x": x / COORD_SCALE,
+            "y": y / COORD_SCALE,
+            "map": map_name,
+            "direction": DIRECTIONS[pflags & 0x03],
+            "moving": bool(pflags & _MOVING),
+            "last_seen": now - age / 1000,
+        })
+    offset += n_players * PlayerRecord.size
+    removed = list(struct.unpack_from(f"<{n_removed}I", data, offset))
+    offset += n_removed * 4
+    tail = data[offset:]
+    return {
+        "players": players,
+        "removed": removed,
+        "full": bool(flags & _FULL),
+        "version": version,
+        "last_seq": last_seq,
+        "messages": json.loads(tail) if tail else [],
+        "epoch": epoch,
+        "map_id": map_id,
+    }
+
+
+# ------------------------------------------------------
+# UDP 位置
+# ------------------------------------------------------
+def encode_position(pid, seq, map_name, x, y, direction, moving):
+    return PositionDatagram.pack(
+        pid, seq & 0xFFFFFFFF, _coord(x), _coord(y), _flags(direction, moving)
+    ) + map_name.encode("utf-8")
+
+
+def decode_position(data):
+    """回傳 {"id", "seq", "map", "x", "y", "direction", "moving"}；格式不對時丟出 ValueError / struct.error。"""
+    pid, seq, x, y, flags = PositionDatagram.unpack_from(data)
+    return {
+        "id": pid,
+        "seq": seq,
+        "map": bytes(data[PositionDatagram.size:]).decode("utf-8"),
+        "x": x / COORD_SCALE,
+        "y": y / COORD_SCALE,
+        "direction": DIRECTIONS[flags & 0x03],
+        "moving": bool(flags & _MOVING),
+    }
+
+
+def is_newer(seq, last):
+    """uint32 序號比較 (會繞回 0)：seq 是否比 last 新。"""
+    return 0 < ((seq - last) & 0xFFFFFFFF) < 0x80000000
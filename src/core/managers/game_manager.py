@@ -12,6 +12,8 @@ import random
 
 if TYPE_CHECKING:
     from src.maps.map import Map
+    from src.maps.map_store import MapStore
+    from src.maps.navigation import RouteLeg
     from src.entities.player import Player
     from src.entities.enemy_trainer import EnemyTrainer
     from src.data.bag import Bag
@@ -24,7 +26,7 @@ class GameManager:
 
     # Map properties
     current_map_key: str
-    maps: dict[str, "Map"]
+    maps: "MapStore"
 
     # Changing Scene properties (for fade transition + teleport)
     should_change_scene: bool
@@ -43,13 +45,14 @@ class GameManager:
 
     def __init__(
         self,
-        maps: dict[str, "Map"],
+        maps: "MapStore",
         start_map: str,
         player: "Player | None",
         enemy_trainers: dict[str, list["EnemyTrainer"]],
         bag: "Bag | None" = None,
     ) -> None:
         from src.data.bag import Bag as _Bag
+        from src.maps.navigation import NavGraph, DistanceFields
 
         # Game Properties
         self.maps = maps
@@ -67,10 +70,11 @@ class GameManager:
         self.is_triggering_dark_event = False
         self.flicker_map_key = ""
 
-        # Navigation target
-        self.target_map_name = ""
-        self.target_position = (0, 0)
-        self.pending_navigation_destination = (0, 0)  
+        # Navigation
+        # 跨地圖導航圖 (由所有傳送點建成)、固定目的地的距離場快取，與換地圖後要繼續走的路線
+        self.nav_graph = NavGraph(maps)
+        self.nav_fields = DistanceFields()
+        self.pending_route: list["RouteLeg"] = []
         self.navigation_active = False  
         self.chat_active = False  
 
@@ -126,8 +130,8 @@ class GameManager:
         # compute next spawn if teleporter info available (only if not forcing pos)
         self._next_spawn = None
         if teleporter_used and not force_pos:
-            dest_map = self.maps[dest]
-            candidates = [t for t in dest_map.teleporters if t.destination == self.current_map_key]
+            # 只讀傳送點資料，不需要在這裡就載入目的地圖
+            candidates = [t for t in self.maps.teleporters(dest) if t.destination == self.current_map_key]
             if candidates:
                 self._next_spawn = candidates[0].pos
 
@@ -139,8 +143,9 @@ class GameManager:
         if not self.should_change_scene:
             return
 
-        # ✔ 換地圖
+        # ✔ 換地圖 (載入目的地與其鄰居，卸載超出預算的舊地圖)
         self.current_map_key = self.next_map
+        self.maps.set_active(self.current_map_key)
         self.next_map = ""
         self.should_change_scene = False
         
@@ -161,21 +166,10 @@ class GameManager:
             # 這裡直接 return，不執行下面的 navigation 或 teleport 邏輯
             return
 
-        # Check if this is a navigation target switch
-        navigation_target = None
-        if self.target_map_name and self.target_position:
-            if self.current_map_key == self.target_map_name:
-                navigation_target = self.target_position
-            self.target_map_name = ""
-            self.target_position = (0, 0)
-
         # ✔ 將玩家放到新地圖的 spawn
         if self.player:
             target_pos = getattr(self, '_next_spawn', None)
-            if navigation_target:
-                # Use navigation target position
-                target_pos = type('Pos', (), {'x': navigation_target[0] * GameSettings.TILE_SIZE, 'y': navigation_target[1] * GameSettings.TILE_SIZE})()
-            elif target_pos is not None:
+            if target_pos is not None:
                 # Place player AWAY from teleporter entrance
                 base_x = target_pos.x
                 base_y = target_pos.y + 2 * GameSettings.TILE_SIZE
@@ -247,8 +241,8 @@ class GameManager:
     def to_dict(self) -> dict[str, object]:
         map_blocks: list[dict[str, object]] = []
 
-        for key, m in self.maps.items():
-            block = m.to_dict()
+        for key in self.maps.keys():
+            block = self.maps.to_dict(key)
             block["enemy_trainers"] = [
                 t.to_dict() for t in self.enemy_trainers.get(key, [])
             ]
@@ -338,22 +332,22 @@ class GameManager:
     # ------------------------------------------------------
     @classmethod
     def from_dict(cls, data: dict[str, object]) -> "GameManager":
-        from src.maps.map import Map
+        from src.maps.map_store import MapStore
         from src.entities.player import Player
         from src.entities.enemy_trainer import EnemyTrainer
         from src.data.bag import Bag
 
-        maps: dict[str, Map] = {}
         trainers: dict[str, list[EnemyTrainer]] = {}
 
         maps_data = data["map"]
 
+        # 地圖延遲載入：只先載入目前地圖與它的傳送點鄰居
+        maps = MapStore(maps_data)
         for entry in maps_data:
-            path = entry["path"]
-            maps[path] = Map.from_dict(entry)
-            trainers[path] = []
+            trainers[entry["path"]] = []
 
         current_map = data["current_map"]
+        maps.set_active(current_map)
 
         bag = Bag.from_dict(data.get("bag", {}))
 
@@ -380,6 +374,10 @@ class GameManager:
     def copy_from(self, other: "GameManager") -> None:
         self.current_map_key = other.current_map_key
         self.maps = other.maps
+        # 導航圖與距離場都是依舊的 MapStore 建的，換成新存檔的 (舊的地圖才能被釋放)
+        self.nav_graph = other.nav_graph
+        self.nav_fields.invalidate()
+        self.pending_route = []
         self.enemy_trainers = other.enemy_trainers
         for key, trainers in self.enemy_trainers.items():
             for t in trainers:
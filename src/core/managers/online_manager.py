@@ -1,19 +1,104 @@
 import requests
+import socket
 import threading
 import time
-from src.utils import Logger
+from collections import deque
+from urllib.parse import urlsplit
+from src.utils import Logger, GameSettings
+from server import wireFormat
 
 class OnlineManager:
+    """
+    線上同步。
+
+    網路請求由兩個背景執行緒送出，各自用一個 keep-alive 的 requests.Session：
+    - 送出 (worker)：update() 只把最新狀態放進 outbox (新的直接覆蓋還沒送出的舊狀態)，
+      send_message() 把訊息排進有上限的佇列。不是每幀都送：tile / 方向 / 移動狀態改變時立刻送，
+      移動中最多 ONLINE_SEND_RATE 次/秒，站著不動時每 ONLINE_HEARTBEAT_INTERVAL 秒送一次 heartbeat
+    - 接收 (receiver)：對 /poll 做 long-poll，名單或聊天有新資料時 server 才回應
+    開啟 ONLINE_UDP 時，worker 改用 UDP datagram 送位置 (帶遞增的 seq，server 丟掉過時的)，
+    名單與聊天只從 receiver 拿；註冊與聊天訊息仍然走 HTTP。
+    兩邊拿到的名單與聊天都寫回 other_players / chat_messages 給遊戲執行緒讀。
+
+    其他玩家每次更新都以 server 收到的時間 (last_seen) 存成快照，畫面上用 get_render_players()
+    取 ONLINE_INTERP_DELAY 秒前的內插位置，更新頻率低也不會一格一格跳。
+    """
+    # 本地保留的聊天訊息數量
+    MAX_CHAT_MESSAGES = 50
+    # 尚未送出的聊天訊息上限 (超過時丟掉最舊的)
+    MAX_OUTGOING_MESSAGES = 20
+    # 單一請求的逾時秒數，避免 worker 卡在斷線的 server 上
+    REQUEST_TIMEOUT = 2.0
+    # 每位遠端玩家保留的快照數量
+    MAX_SNAPSHOTS = 8
+    # 兩次快照相距超過這麼多 tile 時 (例如傳送) 直接跳過去，不內插
+    SNAP_TILES = 3
+    # UDP 時停下來的位置多送幾份 (移動中的更新掉了下一個就會補上，停下來的要等 heartbeat)
+    UDP_STOP_COPIES = 2
+
     def __init__(self):
         self.server_url = "http://127.0.0.1:8989"
         self.player_id = None
         self.other_players = []
-        self.chat_messages = [] 
+        self.chat_messages = []
+        # 本地保存的玩家名單 (只有 _roster_map 這張地圖) 與對應的 server 版本，每次只向 server 要差異
+        self._roster: dict[int, dict] = {}
+        self._roster_version: int | None = None
+        self._roster_map: str | None = None
+        # 已收到的最後一則聊天訊息 seq，之後只拿新訊息並接在 chat_messages 後面
+        self._chat_after: int | None = None
+        # 遠端玩家的快照 {pid: ((server 時間, 玩家資料), ...)}，由 worker 整個換掉，遊戲執行緒直接讀
+        self._tracks: dict[int, tuple[tuple[float, dict], ...]] = {}
+        # 本地時間 - server 時間 (含延遲) 的估計值
+        self._clock_offset: float | None = None
+        # 二進位格式：server 給的地圖 id 與它所屬的 server epoch
+        self._map_ids: dict[str, int] = {}
+        self._map_epoch: int | None = None
+        # 上一次 /poll 的 (地圖, since, after) 與回應的 ETag：同樣的請求、名單與聊天都沒變時 server 只回 304
+        self._poll_etag: tuple[tuple, str] | None = None
+        # 上次送出的 (tile x, tile y, 地圖, 方向, 移動中) 與時間，用來決定這幀要不要送
+        self._sent_key: tuple | None = None
+        self._sent_at = 0.0
+        # 玩家目前所在的地圖 (receiver 依此決定要等哪張地圖的名單)
+        self._map_name: str | None = None
+        # worker 與 receiver 套用回應時互斥
+        self._apply_lock = threading.Lock()
+
+        self._session = self._new_session()
+        self._poll_session = self._new_session()
+        # UDP 位置通道
+        self._udp: socket.socket | None = None
+        self._udp_address: tuple[str, int] | None = None
+        self._udp_seq = 0
+        if GameSettings.ONLINE_UDP:
+            self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._udp_address = (urlsplit(self.server_url).hostname, GameSettings.ONLINE_UDP_PORT)
+
+        # worker 的待辦：最新的玩家狀態 (latest state wins) 與待送出的聊天訊息
+        self._outbox_cond = threading.Condition()
+        self._outbox_state: dict | None = None
+        self._outbox_chat: deque[str] = deque(maxlen=self.MAX_OUTGOING_MESSAGES)
+        self._worker: threading.Thread | None = None
+        self._receiver: threading.Thread | None = None
+
         self._register()
+        if self.player_id is not None:
+            self._worker = threading.Thread(target=self._run, name="OnlineManager", daemon=True)
+            self._worker.start()
+            self._receiver = threading.Thread(target=self._receive, name="OnlineManager-poll", daemon=True)
+            self._receiver.start()
+
+    @staticmethod
+    def _new_session() -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def _register(self):
         try:
-            res = requests.get(f"{self.server_url}/register")
+            res = self._session.get(f"{self.server_url}/register", timeout=self.REQUEST_TIMEOUT)
             if res.status_code == 200:
                 self.player_id = res.json()["id"]
                 Logger.info(f"Registered online with ID: {self.player_id}")
@@ -26,51 +111,268 @@ class OnlineManager:
     def update(self, x, y, map_name, direction="down", moving=False):
         if self.player_id is None: return
 
-        def _task():
-            try:
-                # 1. 上傳自己的狀態
-                payload = {
-                    "id": self.player_id,
-                    "x": x, "y": y,
-                    "map": map_name,
-                    "direction": direction, 
-                    "moving": moving        
-                }
-                requests.post(f"{self.server_url}/players", json=payload)
-
-                # 2. 下載其他玩家
-                res = requests.get(f"{self.server_url}/players")
-                if res.status_code == 200:
-                    all_players = res.json()["players"]
-                    
-                    # ★★★ 修正重點：強制轉型成字串來比對，避免 1 != "1" 的問題 ★★★
-                    my_id_str = str(self.player_id)
-                    self.other_players = [
-                        p for p in all_players 
-                        if str(p.get("id")) != my_id_str
-                    ]
-
-                # 3. 下載聊天訊息
-                chat_res = requests.get(f"{self.server_url}/chat")
-                if chat_res.status_code == 200:
-                    self.chat_messages = chat_res.json()["messages"]
-            except Exception:
-                pass
+        self._map_name = map_name
+        now = time.monotonic()
+        ts = GameSettings.TILE_SIZE
+        key = (int(x // ts), int(y // ts), map_name, direction, moving)
+        if not (key != self._sent_key
+                or (moving and now - self._sent_at >= 1.0 / GameSettings.ONLINE_SEND_RATE)
+                or now - self._sent_at >= GameSettings.ONLINE_HEARTBEAT_INTERVAL):
+            return self.other_players
+        self._sent_key = key
+        self._sent_at = now
 
-        threading.Thread(target=_task, daemon=True).start()
+        with self._outbox_cond:
+            self._outbox_state = {
+                "x": x, "y": y,
+                "map": map_name,
+                "direction": direction,
+                "moving": moving
+            }
+            self._outbox_cond.notify()
         return self.other_players
 
     def get_list_players(self):
         return self.other_players
-    
+
+    def get_render_players(self):
+        """其他玩家在 ONLINE_INTERP_DELAY 秒前的位置 (快照間內插，最新快照之後短暫外插)。"""
+        offset = self._clock_offset or 0.0
+        render_time = time.time() - offset - GameSettings.ONLINE_INTERP_DELAY
+        return [_sample(track, render_time) for track in self._tracks.values()]
+
     def get_chat_history(self):
         return self.chat_messages
 
     def send_message(self, msg):
         if self.player_id is None: return
-        def _send():
+        with self._outbox_cond:
+            self._outbox_chat.append(msg)
+            self._outbox_cond.notify()
+
+    # ------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._outbox_cond:
+                while self._outbox_state is None and not self._outbox_chat:
+                    self._outbox_cond.wait()
+                chat = list(self._outbox_chat)
+                self._outbox_chat.clear()
+                state, self._outbox_state = self._outbox_state, None
+
+            for msg in chat:
+                try:
+                    self._session.post(f"{self.server_url}/chat", json={"id": self.player_id, "msg": msg},
+                                       timeout=self.REQUEST_TIMEOUT)
+                except Exception:
+                    pass
+
+            if state is not None:
+                if self._udp is not None:
+                    self._send_datagram(state)
+                else:
+                    self._sync(state)
+
+    def _send_datagram(self, state: dict) -> None:
+        self._udp_seq += 1
+        packet = wireFormat.encode_position(
+            self.player_id, self._udp_seq, state["map"],
+            state["x"], state["y"], state["direction"], state["moving"]
+        )
+        # 同一個 seq 的複本 server 只會套用第一個收到的
+        for _ in range(1 if state["moving"] else self.UDP_STOP_COPIES):
             try:
-                requests.post(f"{self.server_url}/chat", json={"id": self.player_id, "msg": msg})
-            except:
+                self._udp.sendto(packet, self._udp_address)
+            except OSError:
                 pass
-        threading.Thread(target=_send, daemon=True).start()
\ No newline at end of file
+
+    def _sync(self, state: dict) -> None:
+        # 上傳自己的狀態，同一個回應帶回其他玩家與聊天訊息 (/sync，一次往返)
+        map_name = state["map"]
+        payload = {
+            "id": self.player_id,
+            **state,
+            # 換地圖後名單要整個重拿
+            "since": self._roster_version if map_name == self._roster_map else None,
+            "chat_after": self._chat_after
+        }
+        try:
+            if GameSettings.ONLINE_WIRE_FORMAT == "binary":
+                data = self._sync_binary(payload)
+                if data is None:
+                    return
+            else:
+                res = self._session.post(f"{self.server_url}/sync", json=payload, timeout=self.REQUEST_TIMEOUT)
+                if res.status_code != 200:
+                    return
+                data = res.json()
+        except Exception:
+            # 連線失敗時稍等一下，避免對斷線的 server 空轉
+            time.sleep(0.5)
+            return
+        self._apply(data, map_name, payload["chat_after"])
+
+    # ------------------------------------------------------
+    # Receiver
+    # ------------------------------------------------------
+    def _receive(self):
+        binary = GameSettings.ONLINE_WIRE_FORMAT == "binary"
+        timeout = GameSettings.ONLINE_LONG_POLL_TIMEOUT
+        while True:
+            map_name = self._map_name
+            if map_name is None:
+                time.sleep(0.1)  # 還沒進入遊戲
+                continue
+            since = self._roster_version if map_name == self._roster_map else None
+            after = self._chat_after
+            params = {"id": self.player_id, "map": map_name, "timeout": timeout}
+            if since is not None:
+                params["since"] = since
+            if after is not None:
+                params["after"] = after
+            headers = {"Accept": wireFormat.CONTENT_TYPE} if binary else {}
+            # ETag 只對同一個請求 (同一張地圖、同樣的游標) 有效
+            cursor = (map_name, since, after)
+            if self._poll_etag is not None and self._poll_etag[0] == cursor and since is not None and after is not None:
+                headers["If-None-Match"] = self._poll_etag[1]
+            try:
+                res = self._poll_session.get(
+                    f"{self.server_url}/poll", params=params, timeout=timeout + self.REQUEST_TIMEOUT,
+                    headers=headers
+                )
+                if res.status_code == 304:
+                    continue  # 等到逾時都沒有新資料
+                if res.status_code != 200:
+                    time.sleep(1.0)
+                    continue
+                data = self._decode_binary(res, map_name) if binary else res.json()
+                etag = res.headers.get("ETag")
+                self._poll_etag = (cursor, etag) if etag is not None else None
+            except Exception:
+                time.sleep(1.0)
+                continue
+            self._apply(data, map_name, after)
+
+    def _apply(self, data: dict, map_name: str, chat_after: int | None) -> None:
+        """套用 /sync 或 /poll 的回應 (兩個執行緒的回應可能交錯到達)。"""
+        with self._apply_lock:
+            # 已經換到別的地圖、或比目前名單還舊的差異不套用
+            if map_name == self._map_name and (
+                    data.get("full", True)
+                    or (map_name == self._roster_map and data["version"] >= self._roster_version)):
+                self._apply_roster(data, map_name)
+            self._apply_chat(data, chat_after)
+
+    def _sync_binary(self, payload: dict) -> dict | None:
+        map_name = payload["map"]
+        for _ in range(2):
+            body = wireFormat.encode_request(
+                self.player_id, self._map_epoch, self._map_ids.get(map_name), map_name,
+                payload["since"], payload["chat_after"],
+                payload.get("x"), payload.get("y"), payload.get("direction", "down"), payload.get("moving", False)
+            )
+            res = self._session.post(f"{self.server_url}/sync", data=body, timeout=self.REQUEST_TIMEOUT, headers={
+                "Content-Type": wireFormat.CONTENT_TYPE,
+                "Accept": wireFormat.CONTENT_TYPE,
+            })
+            if res.status_code != 409:
+                break
+            # server 重啟過，地圖 id 失效，改送名稱重試
+            self._map_ids.clear()
+        if res.status_code != 200:
+            return None
+        return self._decode_binary(res, map_name)
+
+    def _decode_binary(self, res: requests.Response, map_name: str) -> dict:
+        data = wireFormat.decode_response(res.content, map_name)
+        if data["epoch"] != self._map_epoch:
+            self._map_ids.clear()
+            self._map_epoch = data["epoch"]
+        self._map_ids[map_name] = data["map_id"]
+        return data
+
+    def _apply_roster(self, data: dict, map_name: str) -> None:
+        """把 server 回傳的名單 (map_name 這張地圖) 差異套用到本地名單。"""
+        if data.get("full", True):
+            self._roster = {}
+            self._roster_map = map_name
+        for pid in data.get("removed", []):
+            self._roster.pop(pid, None)
+        for p in data["players"]:
+            self._roster[p["id"]] = p
+        self._roster_version = data.get("version")
+
+        # ★★★ 修正重點：強制轉型成字串來比對，避免 1 != "1" 的問題 ★★★
+        my_id_str = str(self.player_id)
+        # 換成新的 list，遊戲執行緒拿到的舊 list 不會被修改
+        self.other_players = [
+            p for p in self._roster.values()
+            if str(p.get("id")) != my_id_str
+        ]
+        self._record_snapshots(data["players"])
+
+    def _record_snapshots(self, players: list[dict]) -> None:
+        now = time.time()
+        my_id_str = str(self.player_id)
+        tracks = {pid: track for pid, track in self._tracks.items() if pid in self._roster}
+        ts = GameSettings.TILE_SIZE
+        for p in players:
+            t = p.get("last_seen")
+            if t is None or str(p.get("id")) == my_id_str:
+                continue
+            track = tracks.get(p["id"], ())
+            if track:
+                last_t, last = track[-1]
+                if t <= last_t:
+                    continue  # 沒有新的更新 (例如換地圖後重拿的完整名單)
+                if abs(p["x"] - last["x"]) + abs(p["y"] - last["y"]) > self.SNAP_TILES * ts:
+                    track = ()
+                elif not last.get("moving") and t - 1.0 / GameSettings.ONLINE_SEND_RATE > last_t:
+                    # 站著不動時只有 heartbeat，開始移動前一刻都還在原地
+                    track += ((t - 1.0 / GameSettings.ONLINE_SEND_RATE, last),)
+
+            # 取最小延遲的樣本當作時差，之後緩慢往上追 (server 時鐘可能被調整)；
+            # 很久以前的更新 (例如完整名單裡站著不動的玩家) 不算
+            sample = now - t
+            if self._clock_offset is None or sample < self._clock_offset:
+                self._clock_offset = sample
+            elif sample - self._clock_offset < 1.0:
+                self._clock_offset += (sample - self._clock_offset) * 0.01
+            tracks[p["id"]] = (track + ((t, p),))[-self.MAX_SNAPSHOTS:]
+        self._tracks = tracks
+
+    def _apply_chat(self, data: dict, chat_after: int | None) -> None:
+        """把新聊天訊息接在本地列表後面 (只保留最新 MAX_CHAT_MESSAGES 則)。chat_after 為請求時帶的游標。"""
+        last_seq = data["last_seq"]
+        if chat_after is not None and last_seq < chat_after:
+            # server 重啟過，seq 重新開始 (比目前游標舊、但不比請求游標舊的只是晚到的回應)
+            self.chat_messages = []
+            self._chat_after = None
+        after = self._chat_after or 0
+        messages = [m for m in data["messages"] if m["seq"] > after]
+        if messages:
+            self.chat_messages = (self.chat_messages + messages)[-self.MAX_CHAT_MESSAGES:]
+        self._chat_after = max(after, last_seq)
+
+
+def _sample(track: tuple[tuple[float, dict], ...], render_time: float) -> dict:
+    """在 render_time 時的玩家資料 (x, y 為內插 / 外插的位置，其他欄位取當時最新的快照)。"""
+    i = len(track) - 1
+    while i > 0 and track[i][0] > render_time:
+        i -= 1
+    t0, p0 = track[i]
+    if i + 1 < len(track):
+        t1, p1 = track[i + 1]
+        a = max(0.0, (render_time - t0) / (t1 - t0))
+        base = p0
+    elif i > 0 and p0.get("moving") and t0 > track[i - 1][0]:
+        # 已經超過最新的快照：依最後兩個快照的速度短暫外插
+        t1, p1 = t0, p0
+        t0, p0 = track[i - 1]
+        a = 1.0 + min(render_time - t1, GameSettings.ONLINE_EXTRAPOLATE_LIMIT) / (t1 - t0)
+        base = p1
+    else:
+        return p0
+    return {**base, "x": p0["x"] + (p1["x"] - p0["x"]) * a, "y": p0["y"] + (p1["y"] - p0["y"]) * a}
@@ -33,8 +33,8 @@ class Minimap:
         )
         
         # 地圖像素尺寸
-        self.map_pixel_width = self.map.tmxdata.width * GameSettings.TILE_SIZE
-        self.map_pixel_height = self.map.tmxdata.height * GameSettings.TILE_SIZE
+        self.map_pixel_width = self.map.width * GameSettings.TILE_SIZE
+        self.map_pixel_height = self.map.height * GameSettings.TILE_SIZE
         
         # 計算縮放比例
         self.scale_x = self.minimap_width / self.map_pixel_width if self.map_pixel_width > 0 else 1
@@ -60,15 +60,13 @@ class Minimap:
         
     def _create_minimap_surface(self) -> pg.Surface:
         """
-        根據地圖的 _surface 創建縮放後的 minimap 圖像。
+        根據地圖的預渲染 chunk 創建縮放後的 minimap 圖像。
         """
         try:
-            # 從地圖的預渲染表面縮放
-            scaled_surface = pg.transform.scale(
-                self.map._surface,
+            # 從地圖的預渲染 chunk 縮放
+            return self.map.render_scaled(
                 (self.actual_minimap_width, self.actual_minimap_height)
             )
-            return scaled_surface
         except Exception as e:
             Logger.error(f"Failed to create minimap surface: {e}")
             # 如果失敗，創建一個純色表面作為備用
@@ -84,8 +82,8 @@ class Minimap:
         self.map = map_obj
         
         # 重新計算地圖像素尺寸
-        self.map_pixel_width = self.map.tmxdata.width * GameSettings.TILE_SIZE
-        self.map_pixel_height = self.map.tmxdata.height * GameSettings.TILE_SIZE
+        self.map_pixel_width = self.map.width * GameSettings.TILE_SIZE
+        self.map_pixel_height = self.map.height * GameSettings.TILE_SIZE
         
         # 計算縮放比例
         self.scale_x = self.minimap_width / self.map_pixel_width if self.map_pixel_width > 0 else 1
@@ -1,5 +1,6 @@
 import pygame as pg
-from src.utils import GameSettings
+from src.utils import GameSettings, Teleport
+from src.maps.navigation import find_path, RouteLeg
 from src.core import GameManager
 from src.interface.components.component import UIComponent
 from src.interface.components.button import Button
@@ -17,6 +18,8 @@ class NavigationPanel(UIComponent):
         self.is_navigating = False
         self.navigation_path: List[Tuple[int, int]] = []
         self.current_path_index = 0
+        # 目前這段路走完後要使用的傳送點 (跨地圖路線)
+        self.route_teleporter: Teleport | None = None
         self.navigation_text = "AUTO NAVIGATING"
         self.dot_animation_timer = 0.0
         self.dot_animation_speed = 0.5
@@ -97,7 +100,7 @@ class NavigationPanel(UIComponent):
             self.destination_buttons.append(btn)
 
     def _navigate_to_destination(self, destination: dict):
-        """開始導航到指定目的地 (含跨地圖與特殊地點邏輯)。"""
+        """開始導航到指定目的地 (跨地圖時經由傳送點圖規劃整條路線)。"""
         if not self.game_manager.player:
             return
 
@@ -107,122 +110,70 @@ class NavigationPanel(UIComponent):
         dest_name = destination["name"]
 
         print(f"--- [NAV] 導航開始: 前往 {dest_name} ---")
-        
-        # ==========================================================
-        # 情況 A: 跨地圖導航 (Cross-Map)
-        # ==========================================================
-        if current_map_name != target_map_name:
-            print(f"偵測到跨地圖移動...")
-            
-            teleport_grid_x = 0
-            teleport_grid_y = 0
-            
-            if target_map_name == "new map.tmx":
-                print(f"跨地圖前往 new map.tmx，強制設定傳送點為 (26, 20)")
-                teleport_grid_x = 26
-                teleport_grid_y = 20
-                
-            else:
-                # 這是從 new map 回到主地圖的情況 (map.tmx)
-                start_node = next((d for d in self.destinations if d["name"] == "START"), None)
-                if start_node:
-                    teleport_grid_x = start_node["position"][0]
-                    teleport_grid_y = start_node["position"][1]
-                else:
-                    teleport_grid_x = 16
-                    teleport_grid_y = 29
-                    print("警告: 找不到 START 節點，使用預設座標。")
+        start_grid_pos = (
+            int(self.game_manager.player.position.x // GameSettings.TILE_SIZE),
+            int(self.game_manager.player.position.y // GameSettings.TILE_SIZE)
+        )
 
-            # 執行傳送設置
-            pixel_x = teleport_grid_x * GameSettings.TILE_SIZE
-            pixel_y = teleport_grid_y * GameSettings.TILE_SIZE
-            
-            self.game_manager.target_map_name = target_map_name
-            self.game_manager.target_position = (pixel_x, pixel_y)
-            self.game_manager.next_map = target_map_name
-            
-            # 設定 "傳送後要繼續導航的最終目標"
-            self.game_manager.pending_navigation_destination = target_grid_pos 
-            self.game_manager.should_change_scene = True
-            
-            self.close()
+        route = self.game_manager.nav_graph.route(current_map_name, start_grid_pos, target_map_name, target_grid_pos)
+        if not route:
+            print("無法找到路徑或已在目的地附近。")
             return
+        if len(route) > 1:
+            print(f"跨地圖導航: {' -> '.join(leg.map_key for leg in route)}")
+        if self.follow_route(route):
+            self.close()
+
+    def follow_route(self, route: List[RouteLeg]) -> bool:
+        """開始走路線的第一段 (必須在目前地圖)，其餘段落在換地圖後由 GameScene 接續。"""
+        self.game_manager.pending_route = []
+        self.route_teleporter = None
+        if not route or route[0].map_key != self.game_manager.current_map_key:
+            return False
 
-        # ==========================================================
-        # 情況 B: 同地圖導航 (Same-Map)
-        # ==========================================================
-        print("同地圖導航模式")
+        leg = route[0]
         start_grid_pos = (
             int(self.game_manager.player.position.x // GameSettings.TILE_SIZE),
             int(self.game_manager.player.position.y // GameSettings.TILE_SIZE)
         )
-        end_grid_pos = target_grid_pos
-
-        path = self._find_path(start_grid_pos, end_grid_pos, self.game_manager.current_map, self.game_manager)
-        if path and len(path) > 1:
-            self.navigation_path = path
-            self.current_path_index = 0
-            self.is_navigating = True
-            self.game_manager.navigation_active = True
-            self.close()
-        else:
+        path = self._find_path(start_grid_pos, leg.target, self.game_manager.current_map, self.game_manager)
+        if not path:
             print("無法找到路徑或已在目的地附近。")
+            return False
+        if len(path) == 1 and leg.teleporter is None:
+            return False
 
-    def _find_path(self, start: Tuple[int, int], end: Tuple[int, int], map_obj, game_manager) -> List[Tuple[int, int]]:
-        """使用 BFS 尋找最短路徑，避免碰撞區塊。"""
-        if not map_obj or not hasattr(map_obj, 'tmxdata'):
-            return []
+        self.navigation_path = path
+        self.current_path_index = 0
+        self.route_teleporter = leg.teleporter
+        self.game_manager.pending_route = route[1:]
+        self.is_navigating = True
+        self.game_manager.navigation_active = True
+        return True
 
-        width = map_obj.tmxdata.width
-        height = map_obj.tmxdata.height
+    def _stop_navigation(self):
+        self.is_navigating = False
+        self.game_manager.navigation_active = False
+        self.game_manager.pending_route = []
+        self.route_teleporter = None
 
-        if (start[0] < 0 or start[0] >= width or start[1] < 0 or start[1] >= height or
-            end[0] < 0 or end[0] >= width or end[1] < 0 or end[1] >= height):
+    def _find_path(self, start: Tuple[int, int], end: Tuple[int, int], map_obj, game_manager) -> List[Tuple[int, int]]:
+        """尋找最短路徑，避免碰撞區塊與敵方訓練家 (目的地固定，使用快取的距離場)。"""
+        if not map_obj:
             return []
 
-        # 創建碰撞地圖
-        collision_map = [[False for _ in range(height)] for _ in range(width)]
-
-        # 標記地圖靜態碰撞
-        if hasattr(map_obj, '_collision_map'):
-            for rect in map_obj._collision_map:
-                grid_x = int(rect.x // GameSettings.TILE_SIZE)
-                grid_y = int(rect.y // GameSettings.TILE_SIZE)
-                grid_w = int(rect.width // GameSettings.TILE_SIZE)
-                grid_h = int(rect.height // GameSettings.TILE_SIZE)
-                
-                for x in range(grid_x, min(grid_x + grid_w, width)):
-                    for y in range(grid_y, min(grid_y + grid_h, height)):
-                        collision_map[x][y] = True
-
-        # 標記敵方訓練家動態碰撞
+        # 敵方訓練家是動態碰撞，疊加在地圖共用的導航格上
+        blocked = []
         if game_manager:
             for enemy_trainer in game_manager.current_enemy_trainers:
-                enemy_x = int(enemy_trainer.position.x // GameSettings.TILE_SIZE)
-                enemy_y = int(enemy_trainer.position.y // GameSettings.TILE_SIZE)
-                if 0 <= enemy_x < width and 0 <= enemy_y < height:
-                    collision_map[enemy_x][enemy_y] = True
-
-        # BFS
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        queue = [(start, [start])]
-        visited = set([start])
-
-        while queue:
-            (current, path) = queue.pop(0)
-
-            if current == end:
-                return path
+                blocked.append((
+                    int(enemy_trainer.position.x // GameSettings.TILE_SIZE),
+                    int(enemy_trainer.position.y // GameSettings.TILE_SIZE)
+                ))
 
-            for dx, dy in directions:
-                nx, ny = current[0] + dx, current[1] + dy
-
-                if (0 <= nx < width and 0 <= ny < height and
-                    not collision_map[nx][ny] and (nx, ny) not in visited):
-                    visited.add((nx, ny))
-                    queue.append(((nx, ny), path + [(nx, ny)]))
-
-        return []
+        if game_manager:
+            return game_manager.nav_fields.find_path(map_obj, start, end, blocked)
+        return find_path(map_obj, start, end, blocked)
 
     def update(self, dt: float):
         if not self.is_open and not self.is_navigating:
@@ -260,16 +211,14 @@ class NavigationPanel(UIComponent):
     def _update_navigation(self, dt: float):
         """更新自動導航邏輯 (平滑移動 + 轉向 + 動畫)。"""
         if not self.game_manager.player or not self.navigation_path:
-            self.is_navigating = False
-            self.game_manager.navigation_active = False
+            self._stop_navigation()
             return
 
         # 玩家手動介入則取消導航 (除非在絕對劇情鎖定模式，但這通常由 GameScene 控制 update)
         keys = [pg.K_w, pg.K_a, pg.K_s, pg.K_d]
         for key in keys:
             if input_manager.key_pressed(key):
-                self.is_navigating = False
-                self.game_manager.navigation_active = False
+                self._stop_navigation()
                 return
 
         self.dot_animation_timer += dt
@@ -296,6 +245,13 @@ class NavigationPanel(UIComponent):
                 self.current_path_index += 1
                 
                 if self.current_path_index >= len(self.navigation_path):
+                    if self.route_teleporter is not None:
+                        # 站在傳送點上：換地圖 (冷卻中就下一幀再試)，剩下的路線換地圖後繼續
+                        self.game_manager.switch_map(self.route_teleporter)
+                        if not self.game_manager.should_change_scene:
+                            self.current_path_index = len(self.navigation_path) - 1
+                            return
+                        self.route_teleporter = None
                     self.is_navigating = False
                     self.game_manager.navigation_active = False
                     # 到達終點，切換回 IDLE 動畫 (避免原地踏步)
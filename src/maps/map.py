@@ -1,23 +1,93 @@
+import json
 import pygame as pg
 import pytmx
+from array import array
+from enum import IntFlag
 
 from src.utils import load_tmx, Position, GameSettings, PositionCamera, Teleport
+from src.maps import map_cache
+from src.maps.map_cache import TileLayer, BakedMap
+
+
+def _blit_batch(target: pg.Surface, blits: list[tuple[pg.Surface, tuple[int, int]]]) -> None:
+    # pygame-ce 有更快的 fblits，一般 pygame 退回 blits (只能放 (source, dest)，帶 area 的要直接用 blits)
+    if hasattr(target, 'fblits'):
+        target.fblits(blits)
+    else:
+        target.blits(blits, doreturn=False)
+
+
+class Trigger(IntFlag):
+    """每個 tile 上可以觸發的互動種類 (一個 tile 可同時有多種)。"""
+    BUSH = 1
+    ALTAR = 2
+    SHOP_KEEPER = 4
+    HOSPITAL = 8
+    CASINO = 16
+    ROULETTE = 32
+    AERIAL = 64
+    GYM = 128
+
 
 class Map:
     # 地圖屬性
     path_name: str
-    tmxdata: pytmx.TiledMap
+    _tmxdata: pytmx.TiledMap | None
+    # 地圖大小 (tile 數)
+    width: int
+    height: int
+    # 可見圖塊圖層的 gid 資料 (由 TMX 或快取取得)
+    _layers: list[TileLayer]
     # Position Argument
     spawn: Position
     teleporters: list[Teleport]
     # Rendering Properties
-    _surface: pg.Surface
+    # 地圖切成固定大小的 chunk，draw 時只畫與鏡頭相交的部分
+    CHUNK_TILES: int = 16
+    _chunks: dict[tuple[int, int], pg.Surface]
+    _chunk_px: int
+    _chunks_x: int
+    _chunks_y: int
+    # 可在遊戲中切換顯示的圖層：各自烘焙一份，切換時只重組它碰到的 chunk
+    # (其他圖層第一次被 set_layer_visibility 時也會自動加入)
+    TOGGLEABLE_LAYERS: tuple[str, ...] = ("awaken mon",)
+    _toggleable: set[str]
+    # 圖層分組：連續的固定圖層合成一組，每個可切換圖層自成一組 (名稱為 None 表示固定組)
+    _layer_groups: list[tuple[str | None, list[TileLayer]]]
+    # 被可切換圖層碰到的 chunk：可切換圖層的範圍 (chunk 內座標) 與各組在該範圍內的 surface
+    _group_chunks: dict[tuple[int, int], tuple[pg.Rect, list[pg.Surface]]]
+    # 每個可切換圖層在各 chunk 內佔用的 tile (同一列相鄰的 tile 合併成一個 rect，切換時只重組這些)
+    _layer_chunks: dict[str, dict[tuple[int, int], list[pg.Rect]]]
+    # 縮放後的 tile 圖片，所有地圖共用 (key: tileset, tile id, 翻轉旗標, TILE_SIZE, alpha)
+    _scaled_tiles: dict[tuple, pg.Surface] = {}
+    _tile_keys: dict[int, tuple]
     
     # [新增] 隱藏圖層列表
     hidden_layers: list[str]
 
+    # 圖層名稱 (小寫) 含這些字時為碰撞 / 互動圖層 (判斷方式見 _build_map_logic)
+    COLLISION_KEYWORDS: tuple[str, ...] = (
+        'collision', 'obstacle', 'wall', 'building', 'house', 'tree',
+        'rock', 'cliff', 'mountain', 'water', 'ocean', 'river', 'pond',
+        'lake', 'table', 'chair', 'counter', 'fall'
+    )
+    TRIGGER_KEYWORDS: dict[str, tuple[str, ...]] = {
+        'bush': ('bush',),
+        'altar': ('altar',),
+        'shop': ('shop', 'keeper'),
+        'hospital': ('hospital', 'clinic', 'medical'),
+        'casino': ('thermal',),
+        'roulette': ('aqua',),
+        'aerial': ('aerial',),
+        'gym': ('gym',),
+    }
+    # 關鍵字以外的規則 (優先順序、例外的 tile) 改變時遞增，快取的碰撞 / 互動表才會重建
+    LOGIC_REVISION: int = 1
+
     # Collision & Interaction Rects
-    _collision_map: list[pg.Rect]
+    _collision_map: list[pg.Rect]   # 只用於 hitbox 除錯繪製
+    # 每個 tile 一個 byte 的碰撞表 (index = y * width + x)，查詢只看 rect 覆蓋的 tile
+    _collision_grid: bytearray
     _bush_rects: list[pg.Rect]
     _altar_rects: list[pg.Rect]
     _shop_keeper_rects: list[pg.Rect]
@@ -26,18 +96,36 @@ class Map:
     _roulette_rects: list[pg.Rect] 
     _aerial_rects: list[pg.Rect] 
     _gym_rects: list[pg.Rect] 
+    # 每個 tile 一個 byte 的 Trigger 旗標表，以及 tile -> 傳送點索引
+    _trigger_grid: bytearray
+    _teleport_index: dict[tuple[int, int], list[tuple[int, Teleport]]]
 
     def __init__(self, path: str, tp: list[Teleport], spawn: Position):
         self.path_name = path
-        self.tmxdata = load_tmx(path)
+        self._tmxdata = None
+        self._tile_keys = {}
         self.spawn = spawn
         self.teleporters = tp
         
         # 初始化隱藏列表
         self.hidden_layers = []
 
-        pixel_w = self.tmxdata.width * GameSettings.TILE_SIZE
-        pixel_h = self.tmxdata.height * GameSettings.TILE_SIZE
+        # 先找磁碟快取，命中時不需要解析 TMX
+        cache_args = (path, self.CHUNK_TILES, self.TOGGLEABLE_LAYERS, self.logic_rules())
+        baked = map_cache.load(*cache_args) if GameSettings.MAP_CACHE_ENABLED else None
+        if baked is not None:
+            self.width = baked.width
+            self.height = baked.height
+            self._layers = baked.layers
+        else:
+            self.width = self.tmxdata.width
+            self.height = self.tmxdata.height
+            self._layers = self._tile_layers(self.tmxdata)
+        self._toggleable = {l.name for l in self._layers if l.name in self.TOGGLEABLE_LAYERS}
+        self._build_layer_groups()
+
+        pixel_w = self.width * GameSettings.TILE_SIZE
+        pixel_h = self.height * GameSettings.TILE_SIZE
         
         # Ensure spawn is within the map pixel bounds
         max_x = max(0, pixel_w - GameSettings.TILE_SIZE)
@@ -47,18 +135,92 @@ class Map:
         if self.spawn.y < 0: self.spawn.y = 0
         elif self.spawn.y > max_y: self.spawn.y = max_y
 
-        # Render Map Surface
-        self._surface = pg.Surface((pixel_w, pixel_h), pg.SRCALPHA)
-        self._render_all_layers(self._surface)
-        
-        # Build Collision and Interaction Maps based on Layer Names
-        self._build_map_logic()
+        # Render Map Chunks
+        self._chunk_px = self.CHUNK_TILES * GameSettings.TILE_SIZE
+        self._chunks_x = (pixel_w + self._chunk_px - 1) // self._chunk_px
+        self._chunks_y = (pixel_h + self._chunk_px - 1) // self._chunk_px
+        if baked is not None:
+            self._chunks = baked.chunks
+            self._group_chunks = baked.group_chunks
+            self._collision_grid = baked.collision_grid
+            self._trigger_grid = baked.trigger_grid
+        else:
+            self._chunks = {}
+            for cy in range(self._chunks_y):
+                for cx in range(self._chunks_x):
+                    self._chunks[(cx, cy)] = pg.Surface(self._chunk_size(cx, cy), pg.SRCALPHA)
+            self._render_all_layers()
+            self._bake_layer_groups()
+
+            # Build Collision and Interaction Maps based on Layer Names
+            self._build_map_logic()
+
+            if GameSettings.MAP_CACHE_ENABLED:
+                map_cache.save(*cache_args, BakedMap(
+                    self.width, self.height, self._layers,
+                    self._collision_grid, self._trigger_grid,
+                    self._chunks, self._group_chunks,
+                ))
+
+        # 依照存檔的傳送點調整 (傳送點不屬於 TMX，所以不放進快取)
+        self._apply_teleporters()
+
+    @staticmethod
+    def _tile_layers(tmx: pytmx.TiledMap) -> list[TileLayer]:
+        return [
+            TileLayer(layer.name, getattr(layer, 'opacity', 1.0), array('I', (gid for row in layer.data for gid in row)))
+            for layer in tmx.visible_layers
+            if isinstance(layer, pytmx.TiledTileLayer)
+        ]
+
+    @classmethod
+    def load_nav_grid(cls, data: dict) -> tuple[int, int, bytearray]:
+        """
+        不建立 Map (不繪製、不載入 tile 圖片) 取得 data (存檔的地圖資料) 的導航格：
+        (width, height, 扣除傳送點後的碰撞表)。快取命中時直接讀表，否則只解析 TMX 的圖層。
+        """
+        path = data["path"]
+        grids = None
+        if GameSettings.MAP_CACHE_ENABLED:
+            grids = map_cache.load_grids(path, cls.CHUNK_TILES, cls.TOGGLEABLE_LAYERS, cls.logic_rules())
+        if grids is not None:
+            width, height, collision, _ = grids
+        else:
+            tmx = load_tmx(path, images=False)
+            width, height = tmx.width, tmx.height
+            collision, _ = cls._logic_grids(cls._tile_layers(tmx), width, height, path)
+        cls._clear_teleport_tiles(collision, width, height, [Teleport.from_dict(t) for t in data["teleport"]])
+        return width, height, collision
+
+    @classmethod
+    def logic_rules(cls) -> str:
+        """碰撞 / 互動表判斷規則的摘要 (地圖快取 key 的一部分)。"""
+        return json.dumps([cls.LOGIC_REVISION, cls.COLLISION_KEYWORDS, cls.TRIGGER_KEYWORDS], sort_keys=True)
+
+    @property
+    def tmxdata(self) -> pytmx.TiledMap:
+        # 命中快取時延後解析 TMX，只有真的需要 tile 圖片時才載入
+        if self._tmxdata is None:
+            self._tmxdata = load_tmx(self.path_name)
+        return self._tmxdata
 
     def update(self, dt: float):
         return
 
     def draw(self, screen: pg.Surface, camera: PositionCamera):
-        screen.blit(self._surface, camera.transform_position(Position(0, 0)))
+        # 只 blit 與畫面相交的 chunk，成本取決於螢幕大小而不是地圖大小
+        view_w, view_h = screen.get_size()
+        cam_x, cam_y = int(camera.x), int(camera.y)
+        first_cx = max(0, cam_x // self._chunk_px)
+        last_cx = min(self._chunks_x - 1, (cam_x + view_w - 1) // self._chunk_px)
+        first_cy = max(0, cam_y // self._chunk_px)
+        last_cy = min(self._chunks_y - 1, (cam_y + view_h - 1) // self._chunk_px)
+        for cy in range(first_cy, last_cy + 1):
+            for cx in range(first_cx, last_cx + 1):
+                screen.blit(
+                    self._chunks[(cx, cy)],
+                    (cx * self._chunk_px - cam_x, cy * self._chunk_px - cam_y)
+                )
         if GameSettings.DRAW_HITBOXES:
             for rect in self._collision_map:
                 pg.draw.rect(screen, (255, 0, 0), camera.transform_rect(rect), 1)
@@ -87,9 +249,41 @@ class Map:
                 self.hidden_layers.remove(layer_name)
                 changed = True
         
+        if layer_name not in self._toggleable and any(l.name == layer_name for l in self._layers):
+            # 沒預先宣告的圖層：第一次切換時補烘焙一次分組
+            self._toggleable.add(layer_name)
+            self._build_layer_groups()
+            self._bake_layer_groups()
+
         if changed:
-            self._surface.fill((0, 0, 0, 0)) # 清空畫布
-            self._render_all_layers(self._surface) # 重繪
+            # 只重組這個圖層碰到的範圍，不需要重新讀取 tile
+            for key, rects in self._layer_chunks.get(layer_name, {}).items():
+                self._composite_chunk(key, rects)
+
+    def memory_bytes(self) -> int:
+        """預渲染 chunk (含可切換圖層的分組) 佔用的像素記憶體 (bytes)。"""
+        surfaces = list(self._chunks.values())
+        for _, groups in self._group_chunks.values():
+            surfaces.extend(groups)
+        return sum(s.get_width() * s.get_height() * s.get_bytesize() for s in surfaces)
+
+    def render_scaled(self, size: tuple[int, int]) -> pg.Surface:
+        """把所有 chunk 縮放後拼成一張指定大小的圖 (給小地圖用)。"""
+        target = pg.Surface(size, pg.SRCALPHA)
+        pixel_w = self.width * GameSettings.TILE_SIZE
+        pixel_h = self.height * GameSettings.TILE_SIZE
+        if pixel_w <= 0 or pixel_h <= 0:
+            return target
+        sx = size[0] / pixel_w
+        sy = size[1] / pixel_h
+        for (cx, cy), chunk in self._chunks.items():
+            left = round(cx * self._chunk_px * sx)
+            top = round(cy * self._chunk_px * sy)
+            right = round((cx * self._chunk_px + chunk.get_width()) * sx)
+            bottom = round((cy * self._chunk_px + chunk.get_height()) * sy)
+            if right > left and bottom > top:
+                target.blit(pg.transform.scale(chunk, (right - left, bottom - top)), (left, top))
+        return target
 
     def check_collision(self, obj) -> bool:
         from src.core.dev_tools import dev_tool
@@ -104,160 +298,333 @@ class Map:
                 obj.x, obj.y,
                 GameSettings.TILE_SIZE, GameSettings.TILE_SIZE
             )
+        if rect.width <= 0 or rect.height <= 0:
+            return False
+
+        # 只檢查 rect 覆蓋到的 tile (地圖外視為可通行，與原本的 rect 列表一致)
+        ts = GameSettings.TILE_SIZE
+        x0 = max(0, rect.left // ts)
+        x1 = min(self.width - 1, (rect.right - 1) // ts)
+        y0 = max(0, rect.top // ts)
+        y1 = min(self.height - 1, (rect.bottom - 1) // ts)
+        grid = self._collision_grid
+        for ty in range(y0, y1 + 1):
+            row = ty * self.width
+            for tx in range(x0, x1 + 1):
+                if grid[row + tx]:
+                    return True
+        return False
+
+    @property
+    def nav_grid(self) -> bytearray:
+        """導航用的格子 (即碰撞表，非 0 表示不可通行)。與 Map 共用，呼叫端不要修改。"""
+        return self._collision_grid
 
-        for collision_rect in self._collision_map:
-            if rect.colliderect(collision_rect):
-                return True
+    def is_tile_blocked(self, tx: int, ty: int) -> bool:
+        if 0 <= tx < self.width and 0 <= ty < self.height:
+            return bool(self._collision_grid[ty * self.width + tx])
         return False
 
     def check_teleport(self, pos: Position) -> Teleport | None:
-        player_rect = pg.Rect(pos.x, pos.y, GameSettings.TILE_SIZE, GameSettings.TILE_SIZE)
-        for tp in self.teleporters:
-            teleport_rect = pg.Rect(tp.pos.x, tp.pos.y, GameSettings.TILE_SIZE, GameSettings.TILE_SIZE)
-            if player_rect.colliderect(teleport_rect):
-                # Check center distance
-                pc_x = pos.x + GameSettings.TILE_SIZE // 2
-                pc_y = pos.y + GameSettings.TILE_SIZE // 2
-                tc_x = tp.pos.x + GameSettings.TILE_SIZE // 2
-                tc_y = tp.pos.y + GameSettings.TILE_SIZE // 2
-                if ((pc_x - tc_x)**2 + (pc_y - tc_y)**2)**0.5 <= GameSettings.TILE_SIZE:
-                    return tp
-        return None
+        # 只查玩家 rect 覆蓋到的 tile 上的傳送點，依 teleporters 原本順序取第一個
+        ts = GameSettings.TILE_SIZE
+        player_rect = pg.Rect(pos.x, pos.y, ts, ts)
+        best: tuple[int, Teleport] | None = None
+        for ty in range(player_rect.top // ts, (player_rect.bottom - 1) // ts + 1):
+            for tx in range(player_rect.left // ts, (player_rect.right - 1) // ts + 1):
+                for index, tp in self._teleport_index.get((tx, ty), ()):
+                    if best is not None and best[0] < index:
+                        continue
+                    teleport_rect = pg.Rect(tp.pos.x, tp.pos.y, ts, ts)
+                    if not player_rect.colliderect(teleport_rect):
+                        continue
+                    # Check center distance
+                    pc_x = pos.x + ts // 2
+                    pc_y = pos.y + ts // 2
+                    tc_x = tp.pos.x + ts // 2
+                    tc_y = tp.pos.y + ts // 2
+                    if ((pc_x - tc_x)**2 + (pc_y - tc_y)**2)**0.5 <= ts:
+                        best = (index, tp)
+        return best[1] if best else None
 
     # --- Interaction Checkers ---
-    def _check_interaction(self, pos: Position, rect_list: list[pg.Rect]) -> pg.Rect | None:
+    def get_triggers_at_pos(self, pos: Position) -> Trigger:
+        """回傳玩家中心點所在 tile 上的所有互動種類 (Trigger 旗標)，O(1)。"""
         # 使用中心點進行判定
-        pc_x = pos.x + GameSettings.TILE_SIZE // 2
-        pc_y = pos.y + GameSettings.TILE_SIZE // 2
-        for rect in rect_list:
-            if rect.collidepoint(pc_x, pc_y):
-                return rect
-        return None
+        tx = int((pos.x + GameSettings.TILE_SIZE // 2) // GameSettings.TILE_SIZE)
+        ty = int((pos.y + GameSettings.TILE_SIZE // 2) // GameSettings.TILE_SIZE)
+        if 0 <= tx < self.width and 0 <= ty < self.height:
+            return Trigger(self._trigger_grid[ty * self.width + tx])
+        return Trigger(0)
+
+    def _check_interaction(self, pos: Position, kind: Trigger) -> pg.Rect | None:
+        if not self.get_triggers_at_pos(pos) & kind:
+            return None
+        ts = GameSettings.TILE_SIZE
+        tx = int((pos.x + ts // 2) // ts)
+        ty = int((pos.y + ts // 2) // ts)
+        return pg.Rect(tx * ts, ty * ts, ts, ts)
 
     def get_bush_at_pos(self, pos: Position) -> pg.Rect | None:
-        return self._check_interaction(pos, self._bush_rects)
+        return self._check_interaction(pos, Trigger.BUSH)
 
     def get_altar_at_pos(self, pos: Position) -> pg.Rect | None:
-        return self._check_interaction(pos, self._altar_rects)
+        return self._check_interaction(pos, Trigger.ALTAR)
 
     def get_shop_keeper_at_pos(self, pos: Position) -> pg.Rect | None:
-        return self._check_interaction(pos, self._shop_keeper_rects)
+        return self._check_interaction(pos, Trigger.SHOP_KEEPER)
 
     def get_hospital_at_pos(self, pos: Position) -> pg.Rect | None:
-        return self._check_interaction(pos, self._hospital_rects)
+        return self._check_interaction(pos, Trigger.HOSPITAL)
 
     def get_casino_at_pos(self, pos: Position) -> pg.Rect | None:
-        return self._check_interaction(pos, self._casino_rects)
+        return self._check_interaction(pos, Trigger.CASINO)
     
     def get_roulette_at_pos(self, pos: Position) -> pg.Rect | None:
-        return self._check_interaction(pos, self._roulette_rects)
+        return self._check_interaction(pos, Trigger.ROULETTE)
 
     def get_aerial_at_pos(self, pos: Position) -> pg.Rect | None:
-        return self._check_interaction(pos, self._aerial_rects)
+        return self._check_interaction(pos, Trigger.AERIAL)
 
     def get_gym_at_pos(self, pos: Position) -> pg.Rect | None:
-        return self._check_interaction(pos, self._gym_rects)
+        return self._check_interaction(pos, Trigger.GYM)
 
     # --- Internal Logic Building ---
-    def _render_all_layers(self, target: pg.Surface) -> None:
-        for layer in self.tmxdata.visible_layers:
-            # [新增] 跳過隱藏圖層
-            if layer.name in self.hidden_layers:
+    def _chunk_size(self, cx: int, cy: int) -> tuple[int, int]:
+        pixel_w = self.width * GameSettings.TILE_SIZE
+        pixel_h = self.height * GameSettings.TILE_SIZE
+        return (
+            min(self._chunk_px, pixel_w - cx * self._chunk_px),
+            min(self._chunk_px, pixel_h - cy * self._chunk_px),
+        )
+
+    def _build_layer_groups(self) -> None:
+        self._layer_groups = []
+        for layer in self._layers:
+            if layer.name in self._toggleable:
+                self._layer_groups.append((layer.name, [layer]))
+            elif self._layer_groups and self._layer_groups[-1][0] is None:
+                self._layer_groups[-1][1].append(layer)
+            else:
+                self._layer_groups.append((None, [layer]))
+
+        cs = self.CHUNK_TILES
+        ts = GameSettings.TILE_SIZE
+        self._layer_chunks = {}
+        for layer in self._layers:
+            if layer.name not in self._toggleable:
                 continue
-
-            if isinstance(layer, pytmx.TiledTileLayer):
-                
-                layer_opacity = getattr(layer, 'opacity', 1.0)
-                alpha_value = int(layer_opacity * 255)
-
-                for x, y, gid in layer:
-                    if gid == 0: continue
-                    image = self.tmxdata.get_tile_image_by_gid(gid)
-                    if image:
-                        image = pg.transform.scale(image, (GameSettings.TILE_SIZE, GameSettings.TILE_SIZE))
-                        
-                        if alpha_value < 255:
-                            image.set_alpha(alpha_value)
-                            
-                        target.blit(image, (x * GameSettings.TILE_SIZE, y * GameSettings.TILE_SIZE))
+            runs: dict[tuple[int, int], list[pg.Rect]] = {}
+            for i, gid in enumerate(layer.gids):
+                if gid == 0: continue
+                x, y = i % self.width, i // self.width
+                key = (x // cs, y // cs)
+                px, py = (x % cs) * ts, (y % cs) * ts
+                rects = runs.setdefault(key, [])
+                if rects and rects[-1].top == py and rects[-1].right == px:
+                    rects[-1].width += ts
+                else:
+                    rects.append(pg.Rect(px, py, ts, ts))
+            self._layer_chunks[layer.name] = runs
+
+    def _bake_layer_groups(self) -> None:
+        """替可切換圖層碰到的範圍烘焙每一組圖層各自的 surface (只涵蓋該範圍，不是整個 chunk)。"""
+        regions: dict[tuple[int, int], pg.Rect] = {}
+        for runs in self._layer_chunks.values():
+            for key, rects in runs.items():
+                bounds = rects[0].unionall(rects)
+                regions[key] = regions[key].union(bounds) if key in regions else bounds
+        self._group_chunks = {
+            key: (region, [pg.Surface(region.size, pg.SRCALPHA) for _ in self._layer_groups])
+            for key, region in regions.items()
+        }
+        for index, (_, layers) in enumerate(self._layer_groups):
+            targets = {key: groups[index] for key, (_, groups) in self._group_chunks.items()}
+            self._render_layers(layers, targets, regions)
+
+    def _composite_chunk(self, key: tuple[int, int], rects: list[pg.Rect]) -> None:
+        """用各組 surface 重新合成 chunk 中 rects (chunk 內座標) 的像素。"""
+        chunk = self._chunks[key]
+        region, groups = self._group_chunks[key]
+        for rect in rects:
+            chunk.fill((0, 0, 0, 0), rect) # 清空該範圍
+        for (name, _), surface in zip(self._layer_groups, groups):
+            if name is None or name not in self.hidden_layers:
+                # 帶 area 的三元組：pygame-ce 的 fblits 只接受 (source, dest)，這裡一律用 blits
+                chunk.blits([(surface, rect.topleft, rect.move(-region.x, -region.y)) for rect in rects], doreturn=False)
+
+    def _render_all_layers(self) -> None:
+        # [新增] 跳過隱藏圖層
+        layers = [l for l in self._layers if l.name not in self.hidden_layers]
+        self._render_layers(layers, self._chunks)
+
+    def _render_layers(self, layers: list[TileLayer], targets: dict[tuple[int, int], pg.Surface],
+                       regions: dict[tuple[int, int], pg.Rect] | None = None) -> None:
+        # regions: 目標 surface 只涵蓋 chunk 內的這個範圍時使用 (範圍外的 tile 略過)
+        cs = self.CHUNK_TILES
+        ts = GameSettings.TILE_SIZE
+        for layer in layers:
+            alpha_value = int(layer.opacity * 255)
+
+            # 同一圖層的 tile 不會互相重疊，可以依 chunk 分批 blit
+            batches: dict[tuple[int, int], list[tuple[pg.Surface, tuple[int, int]]]] = {}
+            for i, gid in enumerate(layer.gids):
+                if gid == 0: continue
+                x, y = i % self.width, i // self.width
+                key = (x // cs, y // cs)
+                if key not in targets: continue
+                px, py = (x % cs) * ts, (y % cs) * ts
+                if regions is not None:
+                    region = regions[key]
+                    if not region.collidepoint(px, py): continue
+                    px -= region.x
+                    py -= region.y
+                image = self._get_scaled_tile(gid, alpha_value)
+                if image:
+                    batches.setdefault(key, []).append((image, (px, py)))
+
+            for key, blits in batches.items():
+                _blit_batch(targets[key], blits)
+
+    def _get_scaled_tile(self, gid: int, alpha_value: int) -> pg.Surface | None:
+        tile_key = self._tile_keys.get(gid)
+        if tile_key is None:
+            tile_key = self._tile_key(gid)
+            self._tile_keys[gid] = tile_key
+
+        cache_key = (*tile_key, GameSettings.TILE_SIZE, alpha_value)
+        image = Map._scaled_tiles.get(cache_key)
+        if image is None:
+            image = self.tmxdata.get_tile_image_by_gid(gid)
+            if not image:
+                return None
+            image = pg.transform.scale(image, (GameSettings.TILE_SIZE, GameSettings.TILE_SIZE))
+            if alpha_value < 255:
+                image.set_alpha(alpha_value)
+            Map._scaled_tiles[cache_key] = image
+        return image
+
+    def _tile_key(self, gid: int) -> tuple:
+        """把這張地圖的 pytmx gid 轉成跨地圖通用的 key (tileset, tile id, 翻轉旗標)。"""
+        tmx = self.tmxdata
+        try:
+            tileset = tmx.get_tileset_from_gid(gid)
+        except ValueError:
+            return (self.path_name, gid, None)
+        tiled_gid = tmx.tiledgidmap[gid]
+        flags = next((f for g, f in tmx.gidmap[tiled_gid] if g == gid), None)
+        # 同名、同圖片、同 tile 大小的 tileset 視為同一個 (例如各地圖共用的 tileset.tsx)
+        tileset_id = (tileset.name, tileset.source, tileset.tilewidth, tileset.tileheight)
+        return (tileset_id, tiled_gid - tileset.firstgid, tuple(flags) if flags else None)
 
     def _build_map_logic(self):
-        self._collision_map = []
-        self._bush_rects = []
-        self._altar_rects = []
-        self._shop_keeper_rects = []
-        self._hospital_rects = []
-        self._casino_rects = [] 
-        self._roulette_rects = [] 
-        self._aerial_rects = [] 
-        self._gym_rects = []
+        # 從圖層名稱建立原始碰撞表與互動表 (傳送點的調整在 _apply_teleporters)
+        for layer in self._layers:
+            if any(k in layer.name.lower() for k in self.TRIGGER_KEYWORDS['gym']):
+                print(f"[Map] Loaded Gym Layer: '{layer.name}' in {self.path_name}")
+        self._collision_grid, self._trigger_grid = self._logic_grids(self._layers, self.width, self.height, self.path_name)
 
-        collision_keywords = [
-            'collision', 'obstacle', 'wall', 'building', 'house', 'tree', 
-            'rock', 'cliff', 'mountain', 'water', 'ocean', 'river', 'pond', 
-            'lake', 'table', 'chair', 'counter', 'fall'
-        ]
-        
-        for layer in self.tmxdata.visible_layers:
-            if not isinstance(layer, pytmx.TiledTileLayer):
-                continue
-            
+    @classmethod
+    def _logic_grids(cls, layers: list[TileLayer], width: int, height: int, path_name: str) -> tuple[bytearray, bytearray]:
+        """依圖層名稱算出 (原始碰撞表, 互動表)；不需要 Map 物件，導航格也用同一套規則。"""
+        collision_grid = bytearray(width * height)
+        trigger_grid = bytearray(width * height)
+
+        for layer in layers:
             name = layer.name.lower()
+            has = lambda kind: any(k in name for k in cls.TRIGGER_KEYWORDS[kind])
             
-            is_collision = any(k in name for k in collision_keywords)
-            is_bush = 'bush' in name
-            is_altar = 'altar' in name
-            is_shop = ('shop' in name or 'keeper' in name) and 'hospital' not in name
-            is_hospital = 'hospital' in name or 'clinic' in name or 'medical' in name
-            is_casino = 'thermal' in name
-            is_roulette = 'aqua' in name
-            is_aerial = 'aerial' in name 
-            is_gym = 'gym' in name
-
-            if is_gym:
-                print(f"[Map] Loaded Gym Layer: '{layer.name}' in {self.path_name}")
+            is_collision = any(k in name for k in cls.COLLISION_KEYWORDS)
+            is_bush = has('bush')
+            is_altar = has('altar')
+            is_shop = has('shop') and 'hospital' not in name
+            is_hospital = has('hospital')
+            is_casino = has('casino')
+            is_roulette = has('roulette')
+            is_aerial = has('aerial')
+            is_gym = has('gym')
 
             if not (is_collision or is_bush or is_altar or is_shop or is_hospital or is_casino or is_roulette or is_aerial or is_gym):
                 continue
 
-            for x, y, gid in layer:
+            flags = 0
+            if is_hospital: flags |= Trigger.HOSPITAL
+            elif is_shop: flags |= Trigger.SHOP_KEEPER
+            elif is_casino: flags |= Trigger.CASINO
+            elif is_roulette: flags |= Trigger.ROULETTE
+            elif is_aerial: flags |= Trigger.AERIAL
+            elif is_gym: flags |= Trigger.GYM
+            if is_bush: flags |= Trigger.BUSH
+            if is_altar: flags |= Trigger.ALTAR
+
+            for i, gid in enumerate(layer.gids):
                 if gid == 0: continue
                 
                 # Exclude specific interaction (new map fix)
-                if "new map" in self.path_name and x == 23 and y == 21:
+                if "new map" in path_name and i == 21 * width + 23:
                     if is_hospital: 
                         continue
                 
-                rect = pg.Rect(
-                    x * GameSettings.TILE_SIZE,
-                    y * GameSettings.TILE_SIZE,
-                    GameSettings.TILE_SIZE,
-                    GameSettings.TILE_SIZE
-                )
-                
-                if is_hospital: self._hospital_rects.append(rect)
-                elif is_shop: self._shop_keeper_rects.append(rect)
-                elif is_casino: self._casino_rects.append(rect)
-                elif is_roulette: self._roulette_rects.append(rect)
-                elif is_aerial: self._aerial_rects.append(rect)
-                elif is_gym: self._gym_rects.append(rect)
-                
-                if is_bush: self._bush_rects.append(rect)
-                if is_altar: self._altar_rects.append(rect)
-                if is_collision: self._collision_map.append(rect)
-
+                if flags:
+                    trigger_grid[i] |= flags
+                if is_collision:
+                    collision_grid[i] = 1
+        return collision_grid, trigger_grid
+
+    @staticmethod
+    def _clear_teleport_tiles(grid: bytearray, width: int, height: int, teleporters: list[Teleport]) -> None:
         # Remove collisions at Teleporter positions
-        if self.teleporters:
-            tp_coords = set()
-            for tp in self.teleporters:
-                tx = tp.pos.x // GameSettings.TILE_SIZE
-                ty = tp.pos.y // GameSettings.TILE_SIZE
-                tp_coords.add((tx, ty))
-            
-            self._collision_map = [
-                r for r in self._collision_map 
-                if (r.x // GameSettings.TILE_SIZE, r.y // GameSettings.TILE_SIZE) not in tp_coords
-            ]
+        ts = GameSettings.TILE_SIZE
+        for tp in teleporters:
+            tx = int(tp.pos.x // ts)
+            ty = int(tp.pos.y // ts)
+            if 0 <= tx < width and 0 <= ty < height:
+                grid[ty * width + tx] = 0
+
+    def _apply_teleporters(self):
+        ts = GameSettings.TILE_SIZE
+
+        # 傳送點依所在 tile 建索引
+        self._teleport_index = {}
+        for index, tp in enumerate(self.teleporters):
+            tp_rect = pg.Rect(tp.pos.x, tp.pos.y, ts, ts)
+            for ty in range(tp_rect.top // ts, (tp_rect.bottom - 1) // ts + 1):
+                for tx in range(tp_rect.left // ts, (tp_rect.right - 1) // ts + 1):
+                    self._teleport_index.setdefault((tx, ty), []).append((index, tp))
+
+        self._clear_teleport_tiles(self._collision_grid, self.width, self.height, self.teleporters)
+
+        # 除錯用的 hitbox rect 列表，從表格還原
+        self._collision_map = []
+        self._bush_rects = []
+        self._altar_rects = []
+        self._shop_keeper_rects = []
+        self._hospital_rects = []
+        self._casino_rects = [] 
+        self._roulette_rects = [] 
+        self._aerial_rects = [] 
+        self._gym_rects = []
+        by_flag = [
+            (Trigger.BUSH, self._bush_rects),
+            (Trigger.ALTAR, self._altar_rects),
+            (Trigger.SHOP_KEEPER, self._shop_keeper_rects),
+            (Trigger.HOSPITAL, self._hospital_rects),
+            (Trigger.CASINO, self._casino_rects),
+            (Trigger.ROULETTE, self._roulette_rects),
+            (Trigger.AERIAL, self._aerial_rects),
+            (Trigger.GYM, self._gym_rects),
+        ]
+        for i in range(self.width * self.height):
+            blocked = self._collision_grid[i]
+            flags = self._trigger_grid[i]
+            if not blocked and not flags:
+                continue
+            rect = pg.Rect((i % self.width) * ts, (i // self.width) * ts, ts, ts)
+            if blocked:
+                self._collision_map.append(rect)
+            for flag, rects in by_flag:
+                if flags & flag:
+                    rects.append(rect)
 
     @classmethod
     def from_dict(cls, data: dict) -> "Map":
@@ -0,0 +1,241 @@
+"""
+地圖烘焙結果的磁碟快取。
+
+每張地圖存成一個二進位檔：
+    MAGIC | header 長度 (uint32) | header JSON | 資料區
+header 記錄每段資料 (chunk 像素、可切換圖層範圍內的分組像素、各圖層 gid、碰撞 / 互動表) 在資料區的 offset 與長度，
+讀取時用 mmap 直接切出來，不需要解析 TMX 也不需要重新縮放 tile。
+
+快取 key 由 TMX / TSX / tileset 圖片內容的 hash、TILE_SIZE、chunk 大小、可切換圖層、
+碰撞 / 互動表的判斷規則 (Map.logic_rules) 與格式版本組成，
+任何一項改變都會得到新的檔名，舊檔案會在寫入新快取時刪除。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+
+import pygame as pg
+
+from src.utils import Logger, GameSettings
+from src.utils.loader import ASSETS_DIR
+
+MAGIC = b"MGMAP\x00\x00\x05"
+FORMAT_VERSION = 5
+# 與 pygame SRCALPHA surface 相同的 byte 順序，讀回來的 surface 不需要轉換格式就能快速 blit
+_PIXEL_FORMAT = "BGRA" if sys.byteorder == "little" else "ARGB"
+_HEADER_LEN = struct.Struct("<I")
+
+
+@dataclass
+class TileLayer:
+    """TMX 圖塊圖層的精簡資料，不依賴 pytmx 物件。"""
+    name: str
+    opacity: float
+    gids: array  # array('I')，index = y * width + x
+
+
+@dataclass
+class BakedMap:
+    """一張地圖烘焙後的所有資料 (像素 chunk + gid + 邏輯表)。"""
+    width: int
+    height: int
+    layers: list[TileLayer]
+    collision_grid: bytearray  # 尚未扣除傳送點的原始碰撞表
+    trigger_grid: bytearray
+    chunks: dict[tuple[int, int], pg.Surface]
+    group_chunks: dict[tuple[int, int], tuple[pg.Rect, list[pg.Surface]]]  # 可切換圖層範圍內的分組 surface
+
+
+def _dependencies(path: str) -> list[Path]:
+    """TMX 本身與它引用的 TSX、tileset 圖片。"""
+    tmx_path = ASSETS_DIR / "maps" / path
+    deps = [tmx_path]
+    root = ET.parse(tmx_path).getroot()
+    for img in root.iter("image"):
+        deps.append(tmx_path.parent / img.get("source", ""))
+    for ts in root.iter("tileset"):
+        source = ts.get("source")
+        if not source:
+            continue
+        tsx_path = tmx_path.parent / source
+        deps.append(tsx_path)
+        for img in ET.parse(tsx_path).getroot().iter("image"):
+            deps.append(tsx_path.parent / img.get("source", ""))
+    return deps
+
+
+def cache_key(path: str, chunk_tiles: int, toggleable: tuple[str, ...], logic_rules: str) -> str:
+    h = hashlib.sha1()
+    h.update(f"{FORMAT_VERSION}|{GameSettings.TILE_SIZE}|{chunk_tiles}|{sys.byteorder}".encode())
+    h.update(json.dumps(sorted(toggleable)).encode("utf-8"))
+    # 碰撞 / 互動表是依圖層名稱算出來的，規則改了快取的表也要跟著作廢
+    h.update(logic_rules.encode("utf-8"))
+    for dep in _dependencies(path):
+        h.update(dep.name.encode("utf-8"))
+        h.update(dep.read_bytes())
+    return h.hexdigest()[:20]
+
+
+def _cache_stem(path: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", path)
+
+
+def _cache_file(path: str, key: str) -> Path:
+    return Path(GameSettings.MAP_CACHE_DIR) / f"{_cache_stem(path)}-{key}.bin"
+
+
+def load(path: str, chunk_tiles: int, toggleable: tuple[str, ...], logic_rules: str) -> BakedMap | None:
+    return _read(path, (chunk_tiles, toggleable, logic_rules), _decode)
+
+
+def load_grids(path: str, chunk_tiles: int, toggleable: tuple[str, ...],
+               logic_rules: str) -> tuple[int, int, bytearray, bytearray] | None:
+    """只讀出 (width, height, 碰撞表, 互動表)，不解碼像素 (給不需要畫面的導航用)。"""
+    return _read(path, (chunk_tiles, toggleable, logic_rules), _decode_grids)
+
+
+def _read(path: str, key_args: tuple, decode):
+    try:
+        file = _cache_file(path, cache_key(path, *key_args))
+        if not file.exists():
+            return None
+        with open(file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return decode(view)
+            finally:
+                view.release()
+    except Exception as e:
+        Logger.warning(f"[MapCache] Failed to read cache for '{path}': {e}")
+        return None
+
+
+def _sections(view: memoryview):
+    """回傳 (header, section)，section(entry) 切出資料區的一段；MAGIC 不符時回傳 None。"""
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        return None
+    offset = len(MAGIC)
+    (header_len,) = _HEADER_LEN.unpack_from(view, offset)
+    offset += _HEADER_LEN.size
+    header = json.loads(bytes(view[offset:offset + header_len]).decode("utf-8"))
+    base = offset + header_len
+
+    def section(entry: list[int]) -> memoryview:
+        start, length = entry
+        return view[base + start:base + start + length]
+
+    return header, section
+
+
+def _decode_grids(view: memoryview) -> tuple[int, int, bytearray, bytearray] | None:
+    sections = _sections(view)
+    if sections is None:
+        return None
+    header, section = sections
+    return (header["width"], header["height"],
+            bytearray(section(header["collision"])), bytearray(section(header["trigger"])))
+
+
+def _decode(view: memoryview) -> BakedMap | None:
+    sections = _sections(view)
+    if sections is None:
+        return None
+    header, section = sections
+
+    layers = []
+    for layer in header["layers"]:
+        gids = array("I")
+        gids.frombytes(section(layer["gids"]))
+        layers.append(TileLayer(layer["name"], layer["opacity"], gids))
+
+    def surface(w: int, h: int, start: int, length: int) -> pg.Surface:
+        # frombuffer 直接引用 mmap，copy 之後才能關閉檔案
+        raw = pg.image.frombuffer(section([start, length]), (w, h), _PIXEL_FORMAT)
+        copied = raw.copy()
+        del raw
+        return copied
+
+    chunks = {}
+    for cx, cy, w, h, start, length in header["chunks"]:
+        chunks[(cx, cy)] = surface(w, h, start, length)
+
+    group_chunks: dict[tuple[int, int], tuple[pg.Rect, list[pg.Surface]]] = {}
+    for cx, cy, x, y, w, h, *entries in header["group_chunks"]:
+        group_chunks[(cx, cy)] = (pg.Rect(x, y, w, h), [
+            surface(w, h, entries[i], entries[i + 1]) for i in range(0, len(entries), 2)
+        ])
+
+    return BakedMap(
+        width=header["width"],
+        height=header["height"],
+        layers=layers,
+        collision_grid=bytearray(section(header["collision"])),
+        trigger_grid=bytearray(section(header["trigger"])),
+        chunks=chunks,
+        group_chunks=group_chunks,
+    )
+
+
+def save(path: str, chunk_tiles: int, toggleable: tuple[str, ...], logic_rules: str, baked: BakedMap) -> None:
+    try:
+        key = cache_key(path, chunk_tiles, toggleable, logic_rules)
+        file = _cache_file(path, key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+
+        blobs: list[bytes] = []
+        size = 0
+
+        def add(data: bytes) -> list[int]:
+            nonlocal size
+            blobs.append(data)
+            entry = [size, len(data)]
+            size += len(data)
+            return entry
+
+        header = {
+            "width": baked.width,
+            "height": baked.height,
+            "layers": [
+                {"name": l.name, "opacity": l.opacity, "gids": add(l.gids.tobytes())}
+                for l in baked.layers
+            ],
+            "collision": add(bytes(baked.collision_grid)),
+            "trigger": add(bytes(baked.trigger_grid)),
+            "chunks": [
+                [cx, cy, s.get_width(), s.get_height(), *add(pg.image.tobytes(s, _PIXEL_FORMAT))]
+                for (cx, cy), s in baked.chunks.items()
+            ],
+            "group_chunks": [
+                [cx, cy, *region,
+                 *(v for s in groups for v in add(pg.image.tobytes(s, _PIXEL_FORMAT)))]
+                for (cx, cy), (region, groups) in baked.group_chunks.items()
+            ],
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+
+        tmp = file.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LEN.pack(len(header_bytes)))
+            f.write(header_bytes)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, file)
+
+        # 清掉同一張地圖的舊版本快取
+        for old in file.parent.glob(f"{_cache_stem(path)}-*.bin"):
+            if old != file:
+                old.unlink(missing_ok=True)
+        Logger.info(f"[MapCache] Stored '{path}' ({file.stat().st_size // 1024} KB)")
+    except Exception as e:
+        Logger.warning(f"[MapCache] Failed to write cache for '{path}': {e}")
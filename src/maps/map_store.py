@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Iterator
+
+from src.maps.map import Map
+from src.maps.navigation import NavGrid
+from src.utils import Logger, GameSettings, Teleport
+
+
+class MapStore:
+    """
+    延遲載入的地圖容器 (取代 GameManager 原本的 dict[str, Map])。
+
+    - 只有目前地圖與它的傳送點鄰居會常駐記憶體
+    - 其他地圖在第一次存取時才載入
+    - 超過記憶體預算時，以 LRU 順序卸載最久沒用到的地圖
+    - 卸載的地圖保留原始存檔資料，to_dict 不需要重新載入；
+      不在存檔裡的執行期狀態 (隱藏的圖層) 也會保留，重新載入時套回去
+    - 導航只需要碰撞表：nav_grid 不會為了尋路載入整張地圖
+    """
+    _entries: dict[str, dict]
+    _loaded: "OrderedDict[str, Map]"
+    _active: set[str]
+    _hidden_layers: dict[str, list[str]]
+    _nav_grids: dict[str, NavGrid]
+    budget_bytes: int
+
+    def __init__(self, entries: list[dict], budget_bytes: int | None = None) -> None:
+        self._entries = {}
+        for entry in entries:
+            block = {k: v for k, v in entry.items() if k != "enemy_trainers"}
+            self._entries[entry["path"]] = block
+        self._loaded = OrderedDict()
+        self._active = set()
+        self._hidden_layers = {}
+        self._nav_grids = {}
+        if budget_bytes is None:
+            budget_bytes = GameSettings.MAP_MEMORY_BUDGET_MB * 1024 * 1024
+        self.budget_bytes = budget_bytes
+
+    # ------------------------------------------------------
+    # Mapping 介面
+    # ------------------------------------------------------
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self):
+        return self._entries.keys()
+
+    def __getitem__(self, key: str) -> Map:
+        m = self._loaded.get(key)
+        if m is None:
+            m = self._load(key)
+            self._evict()
+        else:
+            self._loaded.move_to_end(key)
+        return m
+
+    # ------------------------------------------------------
+    # 常駐管理
+    # ------------------------------------------------------
+    def is_loaded(self, key: str) -> bool:
+        return key in self._loaded
+
+    def teleporters(self, key: str) -> list[Teleport]:
+        """不載入地圖就能取得傳送點 (已載入時直接用 Map 上的資料)。"""
+        m = self._loaded.get(key)
+        if m is not None:
+            return m.teleporters
+        return [Teleport.from_dict(t) for t in self._entries[key]["teleport"]]
+
+    def nav_grid(self, key: str) -> NavGrid:
+        """導航格 (已載入時直接用 Map 上的；否則讀快取或只解析 TMX 圖層，結果保留下來)。"""
+        m = self._loaded.get(key)
+        if m is not None:
+            return NavGrid(m.width, m.height, m.nav_grid)
+        grid = self._nav_grids.get(key)
+        if grid is None:
+            grid = NavGrid(*Map.load_nav_grid(self._entries[key]))
+            self._nav_grids[key] = grid
+        return grid
+
+    def set_active(self, key: str) -> None:
+        """設定目前地圖：載入它與傳送點鄰居，並卸載超出預算的其他地圖。"""
+        neighbours = {tp.destination for tp in self.teleporters(key) if tp.destination in self._entries}
+        self._active = {key} | neighbours
+        for dest in sorted(neighbours):
+            if dest not in self._loaded:
+                self._load(dest)
+        # 目前地圖最後存取，放在 LRU 最尾端
+        self[key]
+        self._evict()
+
+    def memory_bytes(self) -> int:
+        return sum(m.memory_bytes() for m in self._loaded.values())
+
+    def to_dict(self, key: str) -> dict:
+        m = self._loaded.get(key)
+        if m is not None:
+            return m.to_dict()
+        return dict(self._entries[key])
+
+    def _load(self, key: str) -> Map:
+        Logger.info(f"[MapStore] Loading map '{key}'")
+        m = Map.from_dict(self._entries[key])
+        for name in self._hidden_layers.pop(key, ()):
+            m.set_layer_visibility(name, False)
+        self._loaded[key] = m
+        return m
+
+    def _evict(self) -> None:
+        total = self.memory_bytes()
+        for key in list(self._loaded.keys()):
+            if total <= self.budget_bytes:
+                break
+            if key in self._active:
+                continue
+            m = self._loaded.pop(key)
+            # 保留最新狀態，之後重新載入或存檔時使用
+            self._entries[key] = m.to_dict()
+            if m.hidden_layers:
+                self._hidden_layers[key] = list(m.hidden_layers)
+            # 導航格很小，留著給之後的路線規劃用
+            self._nav_grids[key] = NavGrid(m.width, m.height, m.nav_grid)
+            total -= m.memory_bytes()
+            Logger.info(f"[MapStore] Evicted map '{key}'")
@@ -0,0 +1,302 @@
+"""
+地圖內的格子尋路與跨地圖路線規劃。
+
+導航格直接使用 Map 的碰撞表 (每張地圖一份，載入時建好，傳送點已扣除)；
+沒有載入的地圖由 MapStore.nav_grid 提供同樣的表 (NavGrid)，不需要繪製地圖。
+會移動的障礙 (例如敵方訓練家) 以 blocked 集合疊加，不會改動共用的格子。
+
+跨地圖時以所有傳送點建成一張圖 (NavGraph)：
+節點是「某張地圖上的某個 tile」，邊是同地圖內走路 (A* 距離，快取) 或走進傳送點。
+
+固定的目的地 (導航清單、劇情自動走路、傳送點) 用 DistanceFields 快取反向距離場，
+之後從任何 tile 出發都只要沿著距離遞減的方向走，不需要再搜尋。
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, TYPE_CHECKING
+
+from src.utils import GameSettings, Teleport
+
+if TYPE_CHECKING:
+    from src.maps.map import Map
+    from src.maps.map_store import MapStore
+
+Tile = tuple[int, int]
+
+
+@dataclass
+class NavGrid:
+    """只有導航需要的欄位 (與 Map 同名，find_path 兩者都能用)。"""
+    width: int
+    height: int
+    nav_grid: bytearray
+
+
+def find_path(map_obj: "Map | NavGrid", start: Tile, end: Tile, blocked: Iterable[Tile] = ()) -> list[Tile]:
+    """
+    A* (Manhattan 啟發、四方向) 尋找 start -> end 的最短路徑，包含起點與終點。
+    起點本身不檢查碰撞 (玩家可能站在傳送點旁邊)；找不到路徑時回傳空 list。
+    """
+    width, height = map_obj.width, map_obj.height
+    sx, sy = start
+    ex, ey = end
+    if not (0 <= sx < width and 0 <= sy < height and 0 <= ex < width and 0 <= ey < height):
+        return []
+
+    grid = map_obj.nav_grid
+    overlay = {y * width + x for x, y in blocked if 0 <= x < width and 0 <= y < height}
+    source = sy * width + sx
+    goal = ey * width + ex
+    if source == goal:
+        return [start]
+    if grid[goal] or goal in overlay:
+        return []
+
+    # 以 index = y * width + x 表示 tile，parent 指標用來還原路徑
+    parent = {source: -1}
+    cost = {source: 0}
+    # (f, h, g, tile)：f 相同時優先展開離終點近的
+    h = abs(sx - ex) + abs(sy - ey)
+    heap = [(h, h, 0, source)]
+    while heap:
+        _, _, g, current = heapq.heappop(heap)
+        if current == goal:
+            break
+        if g > cost[current]:
+            continue  # 已經用更短的距離展開過
+        x, y = current % width, current // width
+        g += 1
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if not (0 <= nx < width and 0 <= ny < height):
+                continue
+            n = ny * width + nx
+            if grid[n] or n in overlay or g >= cost.get(n, g + 1):
+                continue
+            cost[n] = g
+            parent[n] = current
+            h = abs(nx - ex) + abs(ny - ey)
+            heapq.heappush(heap, (g + h, h, g, n))
+    else:
+        return []
+
+    path = []
+    node = goal
+    while node != -1:
+        path.append((node % width, node // width))
+        node = parent[node]
+    path.reverse()
+    return path
+
+
+class DistanceFields:
+    """
+    每個 (地圖, 目的地) 一份的反向距離場 (BFS 步數，-1 表示到不了)，第一次用到時建立。
+
+    距離場已經包含敵方訓練家的阻擋；同一張地圖的訓練家位置或導航格改變時
+    (例如地圖被卸載後重新載入)，該地圖的距離場才會整批作廢。
+    """
+    _fields: dict[tuple[str, Tile], array]
+    _walkable: dict[str, tuple[bytearray, frozenset[int]]]
+
+    def __init__(self) -> None:
+        self._fields = {}
+        self._walkable = {}
+
+    def find_path(self, map_obj: "Map", start: Tile, end: Tile, blocked: Iterable[Tile] = ()) -> list[Tile]:
+        """與 find_path 相同的結果格式，但沿距離場下降，不做搜尋。"""
+        width, height = map_obj.width, map_obj.height
+        sx, sy = start
+        if not (0 <= sx < width and 0 <= sy < height):
+            return []
+        if start == end:
+            return [start]
+        field = self.field(map_obj, end, blocked)
+        if field is None:
+            return []
+
+        d = field[sy * width + sx]
+        if d < 0:
+            # 起點本身不可通行時 (find_path 也不檢查起點)，從距離最小的相鄰 tile 接上
+            d = min((field[ny * width + nx] for nx, ny in ((sx - 1, sy), (sx + 1, sy), (sx, sy - 1), (sx, sy + 1))
+                     if 0 <= nx < width and 0 <= ny < height and field[ny * width + nx] >= 0), default=-2) + 1
+            if d < 0:
+                return []
+
+        path = [start]
+        x, y = sx, sy
+        while d > 0:
+            for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if 0 <= nx < width and 0 <= ny < height and field[ny * width + nx] == d - 1:
+                    break
+            x, y, d = nx, ny, d - 1
+            path.append((x, y))
+        return path
+
+    def field(self, map_obj: "Map", end: Tile, blocked: Iterable[Tile] = ()) -> array | None:
+        width, height = map_obj.width, map_obj.height
+        ex, ey = end
+        if not (0 <= ex < width and 0 <= ey < height):
+            return None
+
+        key = map_obj.path_name
+        overlay = frozenset(y * width + x for x, y in blocked if 0 <= x < width and 0 <= y < height)
+        walkable = self._walkable.get(key)
+        if walkable is None or walkable[0] is not map_obj.nav_grid or walkable[1] != overlay:
+            self.invalidate(key)
+            self._walkable[key] = (map_obj.nav_grid, overlay)
+
+        field = self._fields.get((key, end))
+        if field is None:
+            field = _build_field(map_obj, end, overlay)
+            self._fields[(key, end)] = field
+        return field
+
+    def invalidate(self, map_key: str | None = None) -> None:
+        """清除距離場 (map_key 為 None 時全部清除)。"""
+        if map_key is None:
+            self._fields.clear()
+            self._walkable.clear()
+            return
+        self._fields = {k: v for k, v in self._fields.items() if k[0] != map_key}
+        self._walkable.pop(map_key, None)
+
+
+def _build_field(map_obj: "Map", end: Tile, overlay: frozenset[int]) -> array:
+    # 從終點反向 BFS (四方向移動可逆，所以反向距離就是正向距離)
+    width, height = map_obj.width, map_obj.height
+    grid = map_obj.nav_grid
+    field = array('i', [-1]) * (width * height)
+    goal = end[1] * width + end[0]
+    if grid[goal] or goal in overlay:
+        return field
+    field[goal] = 0
+    queue = deque([goal])
+    while queue:
+        current = queue.popleft()
+        x, y = current % width, current // width
+        d = field[current] + 1
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if not (0 <= nx < width and 0 <= ny < height):
+                continue
+            n = ny * width + nx
+            if field[n] < 0 and not grid[n] and n not in overlay:
+                field[n] = d
+                queue.append(n)
+    return field
+
+
+@dataclass
+class RouteLeg:
+    """路線的一段：在 map_key 上走到 target，teleporter 不是 None 時再從那裡傳送。"""
+    map_key: str
+    target: Tile
+    teleporter: Teleport | None = None
+
+
+class NavGraph:
+    """
+    由所有地圖的傳送點建成的跨地圖導航圖。
+
+    傳送點資料直接從 MapStore 讀，建圖時不需要載入地圖；
+    同地圖內傳送點之間的距離在第一次用到時才以 A* (在 MapStore.nav_grid 上) 計算並快取，
+    規劃路線也不會載入或卸載任何地圖。
+    """
+    _maps: "MapStore"
+    _portals: dict[str, list[tuple[Tile, Teleport]]]
+    _distances: dict[tuple[str, Tile, Tile], int | None]
+
+    def __init__(self, maps: "MapStore") -> None:
+        self._maps = maps
+        self._distances = {}
+        ts = GameSettings.TILE_SIZE
+        self._portals = {
+            key: [
+                ((int(tp.pos.x // ts), int(tp.pos.y // ts)), tp)
+                for tp in maps.teleporters(key) if tp.destination in maps
+            ]
+            for key in maps.keys()
+        }
+
+    def route(self, start_map: str, start: Tile, end_map: str, end: Tile) -> list[RouteLeg]:
+        """回傳從 (start_map, start) 到 (end_map, end) 總步數最少的路線；到不了時回傳空 list。"""
+        if start_map not in self._portals or end_map not in self._portals:
+            return []
+
+        # Dijkstra：節點為 (地圖, tile)，None 代表終點
+        Node = tuple[str, Tile] | None
+        origin: Node = (start_map, start)
+        best: dict[Node, int] = {origin: 0}
+        parent: dict[Node, tuple[Node, Teleport | None]] = {}
+        counter = itertools.count()
+        heap: list[tuple[int, int, Node]] = [(0, next(counter), origin)]
+
+        def relax(node: Node, cost: int, prev: Node, tp: Teleport | None) -> None:
+            if cost < best.get(node, cost + 1):
+                best[node] = cost
+                parent[node] = (prev, tp)
+                heapq.heappush(heap, (cost, next(counter), node))
+
+        while heap:
+            cost, _, node = heapq.heappop(heap)
+            if node is None:
+                break
+            if cost > best[node]:
+                continue
+            map_key, tile = node
+            # 起點所在的 tile 每次查詢都不同，不放進快取
+            cache = node != origin
+            if map_key == end_map:
+                d = self._distance(map_key, tile, end, cache)
+                if d is not None:
+                    relax(None, cost + d, node, None)
+            for portal, tp in self._portals[map_key]:
+                d = self._distance(map_key, tile, portal, cache)
+                if d is not None:
+                    # 走進傳送點再多算一步
+                    relax((tp.destination, self._arrival(tp, map_key)), cost + d + 1, node, tp)
+        else:
+            return []
+
+        # 從終點沿 parent 回推：每條邊是「在 prev 的地圖走到傳送點 (或終點)」
+        legs: list[RouteLeg] = []
+        node = None
+        while node != origin:
+            prev, via = parent[node]
+            legs.append(RouteLeg(prev[0], self._portal_tile(via) if via else end, via))
+            node = prev
+        legs.reverse()
+        return legs
+
+    def invalidate(self, map_key: str | None = None) -> None:
+        """清除距離快取 (map_key 為 None 時全部清除)。"""
+        if map_key is None:
+            self._distances.clear()
+        else:
+            self._distances = {k: v for k, v in self._distances.items() if k[0] != map_key}
+
+    def _portal_tile(self, tp: Teleport) -> Tile:
+        ts = GameSettings.TILE_SIZE
+        return (int(tp.pos.x // ts), int(tp.pos.y // ts))
+
+    def _arrival(self, tp: Teleport, from_map: str) -> Tile:
+        # 與 GameManager.switch_map 相同：抵達目的地中通往來源地圖的第一個傳送點，沒有時用出生點
+        for tile, back in self._portals[tp.destination]:
+            if back.destination == from_map:
+                return tile
+        spawn = self._maps.to_dict(tp.destination)["player"]
+        return (int(spawn["x"]), int(spawn["y"]))
+
+    def _distance(self, map_key: str, a: Tile, b: Tile, cache: bool = True) -> int | None:
+        key = (map_key, a, b)
+        if key in self._distances:
+            return self._distances[key]
+        path = find_path(self._maps.nav_grid(map_key), a, b)
+        d = len(path) - 1 if path else None
+        if cache:
+            self._distances[key] = d
+        return d
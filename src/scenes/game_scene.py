@@ -12,7 +12,7 @@ from src.core.services import sound_manager, input_manager, scene_manager
 from src.utils.particle_system import ParticleManager
 from src.utils.fog_layer import FogLayer
 
-from src.sprites import Sprite, Animation
+from src.sprites import Sprite, Animation, RemoteAvatars
 from src.interface.components.overlay import Overlay
 from src.interface.components.button import Button
 from src.interface.components.backpack_panel import BackpackPanel
@@ -28,6 +28,7 @@ from src.interface.components.roulette_panel import RoulettePanel
 from src.interface.components.dialogue_box import DialogueBox
 from src.interface.components.story_confirmation_panel import StoryConfirmationPanel
 from src.core.story_manager import StoryManager
+from src.maps.map import Trigger
 
 from src.utils import Direction
 from typing import override
@@ -58,6 +59,8 @@ class GameScene(Scene):
             "character/ow5.png", ["down", "left", "right", "up"], 4,
             (GameSettings.TILE_SIZE, GameSettings.TILE_SIZE)
         )
+        # 其他線上玩家共用 sprite_online 的影格，各自記動畫進度
+        self.remote_avatars = RemoteAvatars(self.sprite_online)
 
         self.particle_manager = ParticleManager()
         # [新增] 霧氣層
@@ -175,19 +178,9 @@ class GameScene(Scene):
         self.game_manager.chat_active = active
 
     def _start_pending_navigation(self):
-        if self.game_manager.pending_navigation_destination == (0, 0): return
-        final_dest = self.game_manager.pending_navigation_destination
-        self.game_manager.pending_navigation_destination = (0, 0)
-        start_pos = (
-            int(self.game_manager.player.position.x // GameSettings.TILE_SIZE),
-            int(self.game_manager.player.position.y // GameSettings.TILE_SIZE)
-        )
-        path = self.navigation_panel._find_path(start_pos, final_dest, self.game_manager.current_map, self.game_manager)
-        if path and len(path) > 1:
-            self.navigation_panel.navigation_path = path
-            self.navigation_panel.current_path_index = 0
-            self.navigation_panel.is_navigating = True
-            self.game_manager.navigation_active = True
+        # 跨地圖導航：換地圖後接著走路線的下一段
+        if not self.game_manager.pending_route: return
+        self.navigation_panel.follow_route(self.game_manager.pending_route)
 
     def handle_event(self, event):
         from src.core.dev_tools import dev_tool
@@ -543,6 +536,12 @@ class GameScene(Scene):
             server_msgs = self.online_manager.get_chat_history()
             self.chat_overlay.messages = server_msgs
 
+            current_map = str(self.game_manager.current_map.path_name)
+            self.remote_avatars.update([
+                p for p in self.online_manager.get_render_players()
+                if str(p.get("map")) == current_map
+            ], dt)
+
         self.overlay_button.update(dt)
         self.overlay.update(dt)
         self.backpack_button.update(dt)
@@ -563,17 +562,9 @@ class GameScene(Scene):
         self.game_manager.try_switch_map()
         self.enter() 
 
-        is_nav_event = self.game_manager.pending_navigation_destination != (0, 0)
-        if is_nav_event and self.game_manager.current_map.path_name == "map.tmx":
-            cx, cy = 16 * GameSettings.TILE_SIZE, 29 * GameSettings.TILE_SIZE
-            self.game_manager.player.position.x = float(cx)
-            self.game_manager.player.position.y = float(cy)
-            self.game_manager.player.camera.x = float(cx)
-            self.game_manager.player.camera.y = float(cy)
-            
         if self.minimap: self.minimap.set_map(self.game_manager.current_map)
         
-        if self.game_manager.pending_navigation_destination != (0, 0):
+        if self.game_manager.pending_route:
             self._start_pending_navigation()
             
         self.particle_manager.particles.clear()
@@ -615,29 +606,27 @@ class GameScene(Scene):
                                 except ValueError:
                                     pass
 
+                # 一次查出玩家所在 tile 上的所有互動種類
+                triggers = self.game_manager.current_map.get_triggers_at_pos(self.game_manager.player.position)
+
                 # [新增] Gym 入口互動
-                gym_spot = self.game_manager.current_map.get_gym_at_pos(self.game_manager.player.position)
-                if gym_spot and input_manager.key_pressed(pg.K_SPACE):
+                if triggers & Trigger.GYM and input_manager.key_pressed(pg.K_SPACE):
                     Logger.info("Interaction: Gym Entrance")
                     self.game_manager.switch_map("fog gym.tmx", force_pos=(14, 33))
 
-                casino_spot = self.game_manager.current_map.get_casino_at_pos(self.game_manager.player.position)
-                if casino_spot and input_manager.key_pressed(pg.K_SPACE):
+                if triggers & Trigger.CASINO and input_manager.key_pressed(pg.K_SPACE):
                     self.casino_panel.open()
                 
-                roulette_spot = self.game_manager.current_map.get_roulette_at_pos(self.game_manager.player.position)
-                if roulette_spot and input_manager.key_pressed(pg.K_SPACE):
+                if triggers & Trigger.ROULETTE and input_manager.key_pressed(pg.K_SPACE):
                     self.roulette_panel.open()
 
-                aerial_spot = self.game_manager.current_map.get_aerial_at_pos(self.game_manager.player.position)
-                if aerial_spot and input_manager.key_pressed(pg.K_SPACE):
+                if triggers & Trigger.AERIAL and input_manager.key_pressed(pg.K_SPACE):
                     is_story = self.story_manager.interact_aerial()
                     if is_story:
                         Logger.info("Interaction: Aerial (Story Confirmation Opened)")
 
-                bush = self.game_manager.current_map.get_bush_at_pos(self.game_manager.player.position)
                 now = pg.time.get_ticks() / 1000.0
-                if bush:
+                if triggers & Trigger.BUSH:
                     if self.game_manager.current_map_key == "dark map.tmx":
                          if now - self._last_damage_time >= 3.0: 
                             self._last_damage_time = now
@@ -659,17 +648,14 @@ class GameScene(Scene):
                             else: 
                                 self.show_no_pokemon_warning, self.warning_timer = True, 2.0
 
-                altar = self.game_manager.current_map.get_altar_at_pos(self.game_manager.player.position)
-                if altar and input_manager.key_pressed(pg.K_SPACE):
+                if triggers & Trigger.ALTAR and input_manager.key_pressed(pg.K_SPACE):
                     self.altar_panel.close() if self.altar_panel.is_open else self.altar_panel.open()
 
-                shop_keeper = self.game_manager.current_map.get_shop_keeper_at_pos(self.game_manager.player.position)
-                if shop_keeper and input_manager.key_pressed(pg.K_SPACE):
+                if triggers & Trigger.SHOP_KEEPER and input_manager.key_pressed(pg.K_SPACE):
                     if not self.story_manager.interact_shopkeeper():
                         self.shop_panel.close() if self.shop_panel.is_open else self.shop_panel.open()
 
-                hospital = self.game_manager.current_map.get_hospital_at_pos(self.game_manager.player.position)
-                if hospital and input_manager.key_pressed(pg.K_SPACE):
+                if triggers & Trigger.HOSPITAL and input_manager.key_pressed(pg.K_SPACE):
                     self.hospital_panel.close() if self.hospital_panel.is_open else self.hospital_panel.open()
         except Exception as e:
             Logger.warning(f"Interaction error: {e}")
@@ -707,18 +693,7 @@ class GameScene(Scene):
         self.game_manager.bag.draw(screen)
 
         if self.online_manager and self.game_manager.player:
-            for p in self.online_manager.get_list_players():
-                if str(p.get("map")) == str(self.game_manager.current_map.path_name):
-                    world_pos = Position(p["x"], p["y"])
-                    self.sprite_online.update_pos(world_pos)
-                    direction = p.get("direction", "down")
-                    self.sprite_online.switch(direction)
-                    if p.get("moving", False):
-                        self.sprite_online.update(0.016)
-                    else:
-                        if hasattr(self.sprite_online, 'index'): self.sprite_online.index = 0
-                        elif hasattr(self.sprite_online, 'frame_index'): self.sprite_online.frame_index = 0
-                    self.sprite_online.draw(screen, camera)
+            self.remote_avatars.draw(screen, camera)
 
         self.particle_manager.draw(screen, camera)
         self.fog_layer.draw(screen) 
@@ -1,3 +1,4 @@
 from .sprite import Sprite
 from .background import BackgroundSprite
-from .animation import Animation
\ No newline at end of file
+from .animation import Animation
+from .remote_avatars import RemoteAvatars
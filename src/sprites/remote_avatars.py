@@ -0,0 +1,51 @@
+import pygame as pg
+
+from .animation import Animation
+from src.utils import GameSettings, PositionCamera
+
+class RemoteAvatars:
+    """
+    其他線上玩家的角色。
+
+    所有玩家共用同一個 Animation 裡已經縮放好的影格，
+    每位玩家只記自己的動畫時間 (移動中才前進，停下來回到第一格)；
+    畫面外的玩家不繪製。
+    """
+    animation: Animation
+    phases: dict[int, float]
+    players: list[dict]
+
+    def __init__(self, animation: Animation):
+        self.animation = animation
+        self.phases = {}
+        self.players = []
+
+    def update(self, players: list[dict], dt: float):
+        """players 為這一幀要畫的玩家 (含 id、x、y、direction、moving)。"""
+        loop = self.animation.loop
+        phases = {}
+        for p in players:
+            pid = p["id"]
+            if p.get("moving", False):
+                phases[pid] = (self.phases.get(pid, 0.0) + dt) % loop
+            else:
+                phases[pid] = 0.0
+        # 離開的玩家直接丟掉
+        self.phases = phases
+        self.players = players
+
+    def draw(self, screen: pg.Surface, camera: PositionCamera):
+        animations = self.animation.animations
+        default = animations[self.animation.cur_row]
+        n_keyframes = self.animation.n_keyframes
+        loop = self.animation.loop
+        size = GameSettings.TILE_SIZE
+        view = screen.get_rect()
+        for p in self.players:
+            x = round(p["x"]) - camera.x
+            y = round(p["y"]) - camera.y
+            if x >= view.right or y >= view.bottom or x + size <= view.left or y + size <= view.top:
+                continue
+            frames = animations.get(p.get("direction", "down"), default)
+            idx = int((self.phases.get(p["id"], 0.0) / loop) * n_keyframes)
+            screen.blit(frames[idx], (x, y))
@@ -33,8 +33,10 @@ def load_font(path: str, size: int) -> pg.font.Font:
         Logger.error(f"Failed to load font: {path}")
     return font
 
-def load_tmx(path: str) -> TiledMap:
-    tmxdata = load_pygame(str(ASSETS_DIR / "maps" / path))
+def load_tmx(path: str, images: bool = True) -> TiledMap:
+    # images=False 時只解析圖層資料，不載入 tileset 圖片 (快很多)
+    tmx_path = str(ASSETS_DIR / "maps" / path)
+    tmxdata = load_pygame(tmx_path) if images else TiledMap(tmx_path)
     if tmxdata is None:
         Logger.error(f"Failed to load map: {path}")
     return tmxdata
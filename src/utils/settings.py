@@ -10,6 +10,10 @@ class Settings:
     DEBUG: bool = True          # Debug mode
     TILE_SIZE: int = 64         # Size of each tile in pixels
     DRAW_HITBOXES: bool = True  # Draw hitboxes for debugging
+    # Maps
+    MAP_MEMORY_BUDGET_MB: int = 128  # Baked map memory kept resident before LRU eviction
+    MAP_CACHE_ENABLED: bool = True   # Store baked maps on disk for faster warm starts
+    MAP_CACHE_DIR: str = "cache/maps"
     # Audio
     MAX_CHANNELS: int = 16
     AUDIO_VOLUME: float = 0.5   # Volume of audio
@@ -17,5 +21,13 @@ class Settings:
     # Online
     IS_ONLINE: bool = True
     ONLINE_SERVER_URL: str = "http://localhost:8989"
+    ONLINE_SEND_RATE: float = 10.0          # Max position updates per second while moving
+    ONLINE_HEARTBEAT_INTERVAL: float = 5.0  # Seconds between updates while idle (must stay under the server's PLAYER_TIMEOUT, 600s by default)
+    ONLINE_LONG_POLL_TIMEOUT: float = 20.0  # Seconds the server may hold a /poll request open with no news
+    ONLINE_INTERP_DELAY: float = 0.25       # Remote players are drawn this far in the past, between received snapshots
+    ONLINE_EXTRAPOLATE_LIMIT: float = 0.1   # Max seconds to extrapolate a moving remote player past its last snapshot
+    ONLINE_WIRE_FORMAT: str = "json"        # "json" or "binary" (compact struct records for /sync, see server/wireFormat.py)
+    ONLINE_UDP: bool = False                # Send position updates as UDP datagrams (rosters still arrive via /poll)
+    ONLINE_UDP_PORT: int = 8989
     
 GameSettings = Settings()
\ No newline at end of file